@@ -23,6 +23,9 @@ setup(
     install_requires=requirements,
     packages=find_packages(),
     include_package_data=True,
+    entry_points={
+        "console_scripts": ["shlomobot-pretest=shlomobot_pytest.cli:main"],
+    },
     long_description="""\
     ShlomoBOT helper library for test files
     """,
@@ -0,0 +1,231 @@
+"""
+This module contains a columnar store of check results to analyse the deductions of a whole cohort
+"""
+
+# ================= IMPORTS =================
+
+import re
+import sys
+import json
+from array import array
+from collections import Counter
+from shlomobot_pytest.utils import calculate_total_deducted_score
+
+# ================= CONSTANTS =================
+
+PEP8_CODE_REGEX = re.compile(r"\b([EW]\d{3})\b")
+# Column name to array typecode, in the order they are saved
+COLUMN_TYPECODES = {
+    "student_ids": "I",
+    "check_ids": "I",
+    "cohort_ids": "I",
+    "error_counts": "I",
+    "points_deducted": "I",
+    "pep8_code_ids": "I",
+    "pep8_code_offsets": "Q",
+}
+
+
+def pep8_codes_from_errors(pep8_errors: dict[str, list[str]]) -> list[str]:
+    """
+    Returns the pep8 codes of the errors returned by pep8_conformance
+
+    e.g. {"sample_test.py": ["Row 9: Col 30: E201 whitespace after '('"]} returns ["E201"]
+    """
+    codes = []
+    for error_messages_list in pep8_errors.values():
+        for error_message in error_messages_list:
+            code_match = PEP8_CODE_REGEX.search(error_message)
+            if code_match:
+                codes.append(code_match[1])
+
+    return codes
+
+
+class _StringTable:
+    """Maps strings to consecutive integer ids so they can be stored in an array"""
+
+    def __init__(self, strings: list[str] = ()):
+        self.strings = list(strings)
+        self.ids = {string: string_id for string_id, string in enumerate(self.strings)}
+
+    def id_of(self, string: str) -> int:
+        if string not in self.ids:
+            self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return self.ids[string]
+
+
+class CohortResults:
+    """
+    Stores the outcome of every check of every student in compact columnar arrays
+
+    Each row holds a student, a check, a cohort, the number of errors, the points deducted
+    and the pep8 codes of the errors (stored flattened, with an offset per row).
+    """
+
+    def __init__(self):
+        self.students = _StringTable()
+        self.checks = _StringTable()
+        self.cohorts = _StringTable()
+        self.pep8_codes = _StringTable()
+        self.columns = {name: array(typecode) for name, typecode in COLUMN_TYPECODES.items()}
+        self.columns["pep8_code_offsets"].append(0)
+
+    def __len__(self) -> int:
+        return len(self.columns["student_ids"])
+
+    def record(
+        self,
+        student: str,
+        check: str,
+        number_of_errors: int,
+        points_deducted: int,
+        cohort: str = "",
+        pep8_codes: list[str] = (),
+    ):
+        """Appends the outcome of a single check"""
+        self.columns["student_ids"].append(self.students.id_of(student))
+        self.columns["check_ids"].append(self.checks.id_of(check))
+        self.columns["cohort_ids"].append(self.cohorts.id_of(cohort))
+        self.columns["error_counts"].append(number_of_errors)
+        self.columns["points_deducted"].append(points_deducted)
+        self.columns["pep8_code_ids"].extend(self.pep8_codes.id_of(code) for code in pep8_codes)
+        self.columns["pep8_code_offsets"].append(len(self.columns["pep8_code_ids"]))
+
+    def record_check(
+        self,
+        student: str,
+        check: str,
+        number_of_errors: int,
+        points_per_error: int,
+        max_points_deducted: int,
+        cohort: str = "",
+        pep8_codes: list[str] = (),
+    ):
+        """Appends the outcome of a single check, calculating the points deducted like create_custom_error_json"""
+        points_deducted = calculate_total_deducted_score(points_per_error, max_points_deducted, number_of_errors)
+        self.record(student, check, number_of_errors, points_deducted, cohort, pep8_codes)
+
+    def _sum_by(self, key_column: str, value_column: str, strings: _StringTable) -> dict[str, int]:
+        """Sums a value column grouped by the ids of a key column"""
+        totals = [0] * len(strings.strings)
+        for key_id, value in zip(self.columns[key_column], self.columns[value_column]):
+            totals[key_id] += value
+
+        return dict(zip(strings.strings, totals))
+
+    def deductions_per_check(self) -> dict[str, int]:
+        """Returns the total points deducted by each check"""
+        return self._sum_by("check_ids", "points_deducted", self.checks)
+
+    def errors_per_check(self) -> dict[str, int]:
+        """Returns the total number of errors found by each check"""
+        return self._sum_by("check_ids", "error_counts", self.checks)
+
+    def deductions_per_student(self) -> dict[str, int]:
+        """Returns the total points deducted from each student"""
+        return self._sum_by("student_ids", "points_deducted", self.students)
+
+    def deductions_per_cohort(self) -> dict[str, int]:
+        """Returns the total points deducted from each cohort"""
+        return self._sum_by("cohort_ids", "points_deducted", self.cohorts)
+
+    def pep8_code_counts(self, cohort: str = None) -> Counter:
+        """Returns how many times each pep8 code was found, optionally only in one cohort"""
+        code_ids = self.columns["pep8_code_ids"]
+        if cohort is None:
+            id_counts = Counter(code_ids)
+        else:
+            cohort_id = self.cohorts.ids.get(cohort)
+            offsets = self.columns["pep8_code_offsets"]
+            id_counts = Counter()
+            for row, row_cohort_id in enumerate(self.columns["cohort_ids"]):
+                if row_cohort_id == cohort_id:
+                    id_counts.update(code_ids[offsets[row]: offsets[row + 1]])
+
+        return Counter({self.pep8_codes.strings[code_id]: count for code_id, count in id_counts.items()})
+
+    def deduction_histogram(self, check: str, bin_width: int = 5) -> dict[int, int]:
+        """
+        Returns how many students lost points in each range of points for a check
+
+        e.g. {0: 120, 5: 30, 10: 2} means 120 students lost 0-4 points, 30 lost 5-9 points and 2 lost 10-14 points
+        A student with several results for the check is counted once, with the sum of their deductions
+        """
+        check_id = self.checks.ids.get(check)
+        student_points = Counter()
+        for student_id, row_check_id, points in zip(
+            self.columns["student_ids"], self.columns["check_ids"], self.columns["points_deducted"]
+        ):
+            if row_check_id == check_id:
+                student_points[student_id] += points
+
+        histogram = Counter(points - points % bin_width for points in student_points.values())
+
+        return dict(sorted(histogram.items()))
+
+    def rescore(self, rubric: dict[str, tuple[int, int]]) -> dict[str, int]:
+        """
+        Recalculates the total points deducted from each student under a different rubric
+
+        rubric maps a check to its (points_per_error, max_points_deducted).
+        Checks that are not in the rubric keep their recorded deductions.
+        """
+        check_rubric = [rubric.get(check) for check in self.checks.strings]
+
+        totals = [0] * len(self.students.strings)
+        for student_id, check_id, number_of_errors, points_deducted in zip(
+            self.columns["student_ids"],
+            self.columns["check_ids"],
+            self.columns["error_counts"],
+            self.columns["points_deducted"],
+        ):
+            if check_rubric[check_id] is not None:
+                points_deducted = calculate_total_deducted_score(*check_rubric[check_id], number_of_errors)
+            totals[student_id] += points_deducted
+
+        return dict(zip(self.students.strings, totals))
+
+    def save(self, path: str):
+        """Saves the results to a binary file: a json header followed by the raw arrays"""
+        header = json.dumps(
+            {
+                "byteorder": sys.byteorder,
+                "students": self.students.strings,
+                "checks": self.checks.strings,
+                "cohorts": self.cohorts.strings,
+                "pep8_codes": self.pep8_codes.strings,
+                "lengths": {name: len(column) for name, column in self.columns.items()},
+                "itemsizes": {name: column.itemsize for name, column in self.columns.items()},
+            }
+        ).encode()
+
+        with open(path, "wb") as f:
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for column in self.columns.values():
+                column.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> "CohortResults":
+        """Loads results that were saved with save()"""
+        results = cls()
+        with open(path, "rb") as f:
+            header_length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_length))
+
+            results.students = _StringTable(header["students"])
+            results.checks = _StringTable(header["checks"])
+            results.cohorts = _StringTable(header["cohorts"])
+            results.pep8_codes = _StringTable(header["pep8_codes"])
+            for name, typecode in COLUMN_TYPECODES.items():
+                column = array(typecode)
+                if column.itemsize != header["itemsizes"][name]:
+                    raise ValueError(f"{path} was saved on a platform with a different {name} item size")
+                column.fromfile(f, header["lengths"][name])
+                if header["byteorder"] != sys.byteorder:
+                    column.byteswap()
+                results.columns[name] = column
+
+        return results
@@ -7,26 +7,94 @@ The custom error messages to be raised mainly remain the same also
 from shlomobot_pytest.pretest import (
     find_missing_expected_files,
     find_missing_expected_functions,
-    pep8_conformance,
+    pep8_error_summary,
 )
 
-from shlomobot_pytest.utils import create_custom_error_json
+from shlomobot_pytest.utils import (
+    create_custom_error_json,
+    format_custom_error_json,
+    calculate_total_deducted_score,
+    error_limit_for_deduction,
+    summarise_error_codes,
+)
+from shlomobot_pytest.performance import (
+    COMPLEXITY_ORDER_TOLERANCE,
+    MAX_MEASURE_SECONDS,
+    ComplexityTimeoutError,
+    validate_complexity_class,
+    measure_complexity,
+    is_within_complexity,
+    compare_runtime,
+    compare_peak_memory,
+)
+from shlomobot_pytest.differential import find_differential_failure, describe_failing_case
+from shlomobot_pytest.name_matching import suggest_file_names, suggest_function_names, describe_missing_names
+from types import FunctionType
+from typing import Any, Callable
+import operator
+import random
+
+
+def _count_missing_names(
+    missing_names: list[str], suggestions: dict[str, list[str]], typo_points_per_error: int | None
+) -> tuple[int, int]:
+    """
+    Returns the (number of typos, number of other missing names).
+    Names with a close suggestion only count as typos when typo_points_per_error is given
+    """
+    if typo_points_per_error is None:
+        return 0, len(missing_names)
+
+    number_of_typos = len([name for name in missing_names if name in suggestions])
+
+    return number_of_typos, len(missing_names) - number_of_typos
+
+
+def _missing_names_deduction(
+    missing_names: list[str],
+    suggestions: dict[str, list[str]],
+    points_per_error: int,
+    max_points_deducted: int,
+    typo_points_per_error: int | None,
+) -> int:
+    """Returns the points to deduct for missing names, where likely typos deduct typo_points_per_error each"""
+    number_of_typos, number_of_other_errors = _count_missing_names(missing_names, suggestions, typo_points_per_error)
+    total_points_deducted = calculate_total_deducted_score(
+        points_per_error, max_points_deducted, number_of_other_errors
+    )
+    if number_of_typos:
+        total_points_deducted += calculate_total_deducted_score(
+            typo_points_per_error, max_points_deducted, number_of_typos
+        )
+
+    return min(total_points_deducted, max_points_deducted)
 
 
 def assert_missing_expected_files(
     filenames_list: list[str],
     points_per_error: int = 100,
     max_points_deducted: int = 100,
+    typo_points_per_error: int = None,
 ):
-    """Assert that no expected files are missing"""
+    """
+    Assert that no expected files are missing
+
+    The feedback suggests submitted files with a similar name. When typo_points_per_error is given,
+    missing files with a suggestion deduct typo_points_per_error instead of points_per_error
+    """
 
     wrongly_named_files = find_missing_expected_files(filenames_list)
+    suggestions = suggest_file_names(filenames_list, wrongly_named_files)
+    total_points_deducted = _missing_names_deduction(
+        wrongly_named_files, suggestions, points_per_error, max_points_deducted, typo_points_per_error
+    )
 
-    custom_error_message = create_custom_error_json(
-        points_per_error,
-        max_points_deducted,
-        feedback=f"The name for the following submitted file(s) are wrong: {', '.join(wrongly_named_files)}",
-        number_of_errors=len(wrongly_named_files),
+    custom_error_message = format_custom_error_json(
+        feedback=(
+            "The name for the following submitted file(s) are wrong: "
+            f"{describe_missing_names(wrongly_named_files, suggestions)}"
+        ),
+        total_points_deducted=total_points_deducted,
     )
 
     assert wrongly_named_files == [], custom_error_message
@@ -36,16 +104,27 @@ def assert_missing_expected_functions(
     file_function_map: dict[str, list[str]],
     points_per_error: int = 100,
     max_points_deducted: int = 100,
+    typo_points_per_error: int = None,
 ):
-    """Assert that no expected functions are missing"""
+    """
+    Assert that no expected functions are missing
+
+    The feedback suggests defined functions with a similar name. When typo_points_per_error is given,
+    missing functions with a suggestion deduct typo_points_per_error instead of points_per_error
+    """
 
     wrongly_named_functions = find_missing_expected_functions(file_function_map)
+    suggestions = suggest_function_names(file_function_map, wrongly_named_functions)
+    total_points_deducted = _missing_names_deduction(
+        wrongly_named_functions, suggestions, points_per_error, max_points_deducted, typo_points_per_error
+    )
 
-    custom_error_message = create_custom_error_json(
-        points_per_error,
-        max_points_deducted,
-        feedback=f"The name for the following function(s) are wrong: {', '.join(wrongly_named_functions)}",
-        number_of_errors=len(wrongly_named_functions),
+    custom_error_message = format_custom_error_json(
+        feedback=(
+            "The name for the following function(s) are wrong: "
+            f"{describe_missing_names(wrongly_named_functions, suggestions)}"
+        ),
+        total_points_deducted=total_points_deducted,
     )
 
     assert wrongly_named_functions == [], custom_error_message
@@ -55,22 +134,154 @@ def assert_pep8_conformance(
     filenames_list: list[str],
     points_per_error: int = 5,
     max_points_deducted: int = 30,
+    count_all_errors: bool = False,
 ):
-    """Assert that Pep8 is conformed to"""
-    pep8_errors = pep8_conformance(filenames_list)
+    """
+    Assert that Pep8 is conformed to
 
-    combined_errors_string_list = []
-    total_num_of_errors = 0
-    for filename, error_messages_list in pep8_errors.items():
-        individual_file_errors_string = f"{filename} - {', '.join(error_messages_list)}"
-        combined_errors_string_list.append(individual_file_errors_string)
-        total_num_of_errors += len(error_messages_list)
+    Stops counting errors once max_points_deducted is reached, unless count_all_errors is True
+    """
+    error_limit = None if count_all_errors else error_limit_for_deduction(points_per_error, max_points_deducted)
+    total_num_of_errors, code_counts, examples = pep8_error_summary(filenames_list, error_limit)
 
     custom_error_message = create_custom_error_json(
         points_per_error,
         max_points_deducted,
         total_num_of_errors,
-        feedback=f"{'; '.join(combined_errors_string_list)}",
+        feedback=summarise_error_codes(total_num_of_errors, code_counts, examples, error_limit),
+    )
+
+    assert total_num_of_errors == 0, custom_error_message
+
+
+def assert_complexity(
+    function: FunctionType,
+    input_generator: Callable[[int], tuple],
+    expected_complexity: str,
+    points_per_error: int = 20,
+    max_points_deducted: int = 20,
+    min_size: int = 1000,
+    growth_factor: int = 2,
+    number_of_sizes: int = 6,
+    repeats: int = 5,
+    warmup: int = 1,
+    tolerance: float = COMPLEXITY_ORDER_TOLERANCE,
+):
+    """
+    Assert that the function scales within the expected complexity class (e.g. "O(n log n)")
+
+    input_generator receives an input size and returns a tuple of positional arguments for the function.
+    The function fails only when its empirical order of growth exceeds the expected class's order by more than tolerance
+    """
+    validate_complexity_class(expected_complexity)
+    try:
+        measured_complexity, empirical_order, sizes = measure_complexity(
+            function, input_generator, min_size, growth_factor, number_of_sizes, repeats, warmup
+        )
+        feedback = (
+            f"The function {function.__name__} should run in {expected_complexity} "
+            f"but it scales like {measured_complexity} (empirical order of growth {empirical_order:.2f})"
+        )
+        is_within = is_within_complexity(empirical_order, expected_complexity, sizes, tolerance)
+    except ComplexityTimeoutError:
+        # A function that is too slow to measure does not run within the expected complexity either
+        feedback = (
+            f"The function {function.__name__} should run in {expected_complexity} "
+            f"but it is too slow to be measured within {MAX_MEASURE_SECONDS:g} seconds"
+        )
+        is_within = False
+
+    custom_error_message = create_custom_error_json(
+        points_per_error,
+        max_points_deducted,
+        feedback=feedback,
+        number_of_errors=1,
+    )
+
+    assert is_within, custom_error_message
+
+
+def assert_within_budget(
+    function: FunctionType,
+    reference_function: FunctionType,
+    inputs: list[tuple],
+    max_time_ratio: float = 2.0,
+    max_memory_ratio: float = 2.0,
+    points_per_error: int = 10,
+    max_points_deducted: int = 20,
+    repeats: int = 7,
+):
+    """
+    Assert that the function runs within a ratio of the time and peak memory of a reference solution
+
+    inputs is a list of tuples of positional arguments that both functions are run on.
+    A ratio can be set to None to skip that budget.
+    """
+    exceeded_budgets = []
+
+    if max_time_ratio is not None:
+        function_time, reference_time = compare_runtime(function, reference_function, inputs, repeats)
+        time_ratio = function_time / reference_time if reference_time else float("inf")
+        if time_ratio > max_time_ratio:
+            exceeded_budgets.append(
+                f"it took {time_ratio:.1f} times as long as the reference solution (allowed {max_time_ratio})"
+            )
+
+    if max_memory_ratio is not None:
+        function_memory, reference_memory = compare_peak_memory(function, reference_function, inputs)
+        memory_ratio = function_memory / reference_memory
+        if memory_ratio > max_memory_ratio:
+            exceeded_budgets.append(
+                f"it used {memory_ratio:.1f} times as much memory as the reference solution (allowed {max_memory_ratio})"
+            )
+
+    custom_error_message = create_custom_error_json(
+        points_per_error,
+        max_points_deducted,
+        feedback=f"The function {function.__name__} is not efficient enough: {'; '.join(exceeded_budgets)}",
+        number_of_errors=len(exceeded_budgets),
+    )
+
+    assert exceeded_budgets == [], custom_error_message
+
+
+def assert_matches_reference(
+    function: FunctionType,
+    reference_function: FunctionType,
+    input_generator: Callable[[random.Random], tuple],
+    points_per_error: int = 10,
+    max_points_deducted: int = 10,
+    number_of_cases: int = 1000,
+    workers: int = None,
+    case_timeout: float = 1.0,
+    seed: int = 0,
+    compare: Callable[[Any, Any], bool] = operator.eq,
+):
+    """
+    Assert that the function behaves like the reference function on generated inputs
+
+    input_generator receives a random.Random instance and returns a tuple of positional arguments for the functions
+    """
+    failing_case = find_differential_failure(
+        function,
+        reference_function,
+        input_generator,
+        number_of_cases=number_of_cases,
+        workers=workers,
+        case_timeout=case_timeout,
+        seed=seed,
+        compare=compare,
+    )
+
+    feedback = ""
+    if failing_case is not None:
+        feedback = f"Your function gave a wrong result: {describe_failing_case(function.__name__, failing_case)}"
+
+    custom_error_message = create_custom_error_json(
+        points_per_error,
+        max_points_deducted,
+        feedback=feedback,
+        number_of_errors=1,
     )
 
-    assert pep8_errors == {}, custom_error_message
+    assert failing_case is None, custom_error_message
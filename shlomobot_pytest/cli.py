@@ -0,0 +1,157 @@
+"""
+This module contains the shlomobot-pretest command, which runs the pretests directly without pytest
+
+Example:
+shlomobot-pretest submission_dir --map '{"sample_test.py": ["main", "function1"]}' --rubric rubric.json --json
+"""
+
+# ================= IMPORTS =================
+
+import os
+import sys
+import json
+import argparse
+from shlomobot_pytest import pretest
+
+# ================= CONSTANTS =================
+
+PASSED = "passed"
+FAILED = "failed"
+SKIPPED = "skipped"
+ERROR = "error"
+END_MARKER = " EndMarker"
+
+
+def load_json_argument(value: str) -> dict:
+    """Loads a json argument that is given either as a json string or as a path to a json file"""
+    if os.path.isfile(value):
+        with open(value, "r") as f:
+            return json.load(f)
+
+    return json.loads(value)
+
+
+def parse_custom_error_json(custom_error_message: str) -> dict | str:
+    """
+    Converts a message created by create_custom_error_json back to a dictionary.
+    Returns the message as is when the feedback cannot be parsed (e.g. it contains quotes)
+    """
+    try:
+        return json.loads(custom_error_message.removesuffix(END_MARKER))
+    except json.JSONDecodeError:
+        return custom_error_message
+
+
+def validate_rubric(rubric: dict[str, dict[str, str | int]]):
+    """Raises ValueError if the rubric contains names that are not pretests"""
+    unknown_tests = [test_name for test_name in rubric if test_name not in pretest.PRETEST_DEPENDENCIES]
+    if unknown_tests:
+        raise ValueError(
+            f"Unknown pretest(s) {', '.join(unknown_tests)}, expected some of {', '.join(pretest.PRETEST_DEPENDENCIES)}"
+        )
+
+
+def run_pretests(
+    file_function_map: dict[str, list[str]], rubric: dict[str, dict[str, str | int]] = None
+) -> list[dict]:
+    """
+    Runs the pretests in the order of PRETEST_DEPENDENCIES, like register_tests and pytest would.
+
+    rubric maps a pretest name to the keyword arguments given to it in register_tests
+    (e.g. {"test_docstring_exists": {"feedback": "Docstring Where??"}}). Only the pretests in
+    the rubric are run, all of them with their defaults when rubric is None.
+    A pretest is skipped when one of its dependencies ran and did not pass (dependencies that are
+    not in the rubric do not hold it back). Raises ValueError if the rubric contains unknown pretests.
+
+    Returns a list of {"test": name, "status": PASSED/FAILED/SKIPPED/ERROR, "result": ...} dictionaries,
+    where result is the create_custom_error_json message of a failed pretest or the error of a crashed one
+    """
+    if rubric is None:
+        rubric = {test_name: {} for test_name in pretest.PRETEST_DEPENDENCIES}
+    validate_rubric(rubric)
+
+    not_passed_tests = set()
+    results = []
+    for test_name, depends in pretest.PRETEST_DEPENDENCIES.items():
+        if test_name not in rubric:
+            continue
+
+        status, result = PASSED, None
+        if any(dependency in not_passed_tests for dependency in depends):
+            status = SKIPPED
+        else:
+            pretest_function = getattr(pretest, f"{test_name}_pretest")
+            try:
+                pretest_function(file_function_map, **rubric[test_name])
+            except AssertionError as error:
+                status, result = FAILED, str(error)
+            except Exception as error:
+                status, result = ERROR, f"{type(error).__name__}: {error}"
+
+        if status != PASSED:
+            not_passed_tests.add(test_name)
+        results.append({"test": test_name, "status": status, "result": result})
+
+    return results
+
+
+def parse_arguments(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="shlomobot-pretest",
+        description="Runs the ShlomoBOT pretests on a submission without pytest",
+    )
+    parser.add_argument("directory", help="The directory of the submitted files")
+    parser.add_argument(
+        "--map",
+        required=True,
+        type=load_json_argument,
+        help="The file function map, as a json string or a path to a json file",
+    )
+    parser.add_argument(
+        "--rubric",
+        type=load_json_argument,
+        default=None,
+        help="Pretest names mapped to their register_tests options, as a json string or a path to a json file",
+    )
+    parser.add_argument("--json", action="store_true", help="Print every pretest result as json")
+
+    arguments = parser.parse_args(argv)
+    if arguments.rubric is not None:
+        try:
+            validate_rubric(arguments.rubric)
+        except ValueError as error:
+            parser.error(str(error))
+
+    return arguments
+
+
+def main(argv: list[str] = None) -> int:
+    """
+    Runs the pretests on the submission and prints the create_custom_error_json message of every failed pretest,
+    or every result as json with --json.
+    Returns 1 if a pretest failed or crashed, 0 otherwise (pretests skipped after a failure do not count)
+    """
+    arguments = parse_arguments(argv)
+
+    # The pretests use relative file names and import the submitted files as modules
+    directory = os.path.abspath(arguments.directory)
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+
+    results = run_pretests(arguments.map, arguments.rubric)
+
+    if arguments.json:
+        for result in results:
+            if result["status"] == FAILED:
+                result["result"] = parse_custom_error_json(result["result"])
+        print(json.dumps(results))
+    else:
+        for result in results:
+            if result["status"] in (FAILED, ERROR):
+                print(result["result"])
+
+    return 1 if any(result["status"] in (FAILED, ERROR) for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,14 +16,16 @@ from shlomobot_pytest.utils import (
     get_functions_from_files,
     get_clean_function_lines,
     function_contains_regex,
-    get_function_regex_matches,
     get_imported_modules,
+    search_patterns_within_budget,
+    RegexTimeoutError,
+    InconclusiveCheckError,
 )
+from shlomobot_pytest.flow_analysis import find_unclosed_files
 from pathlib import Path
 from importlib import import_module
-from collections import defaultdict
+from collections import defaultdict, Counter
 import pep8
-import pytest
 
 # ================= CONSTANTS =================
 
@@ -40,8 +42,7 @@ GLOBAL_DECLARATION_REGEX = re.compile(r"^[ \t]*global[ \t]+\w*(?:, *\w+)*(?=[ \t
 LIST_COMPREHENTION_REGEX = re.compile(
     r"\[\s*[\w\.\(\)'\"]+\s+(?:if .*? else [\w\.\(\)'\"]+\s+)?for\s+\w+\s+in\s+[\w\.\(\)'\"]+\s*(?:if .*)?\]"
 )
-OPEN_FILE_REGEX = re.compile(r"(\w*) = open\(")
-CLOSE_FILE_REGEX = re.compile(r"(\w*)\.close\(\)")
+MAX_ERROR_EXAMPLES = 5
 
 
 def contains_name_eq_main_statement(py_filename: str) -> bool:
@@ -69,10 +70,12 @@ def is_main_function_last(py_filename: str) -> bool:
     return functions[-1] == "main"
 
 
-def find_functions_with_missing_docstrings(file_list: list[str]) -> list[str]:
+def find_functions_with_missing_docstrings(file_list: list[str], max_errors: int = None) -> list[str]:
     """
     Checks if the user created docstrings for all functions except 'main' function
     Returns a list of functions where docstrings are missing
+
+    When max_errors is given, stops looking once max_errors functions were found
     """
 
     functions_list = get_functions_from_files(file_list)
@@ -85,14 +88,18 @@ def find_functions_with_missing_docstrings(file_list: list[str]) -> list[str]:
         # Handle missing docstrings
         if not function.__doc__:
             func_missing_docstrings.append(function.__name__)
+            if len(func_missing_docstrings) == max_errors:
+                break
 
     return func_missing_docstrings
 
 
-def find_functions_with_single_quote_docstrings(file_list: list[str]) -> list[str]:
+def find_functions_with_single_quote_docstrings(file_list: list[str], max_errors: int = None) -> list[str]:
     """
     Check if the user created docstrings using double or single quotes
     Returns a list of functions where single quotes were used for docstrings
+
+    When max_errors is given, stops looking once max_errors functions were found
     """
     single_quote_docstrings = []
     functions_list = get_functions_from_files(file_list)
@@ -107,6 +114,8 @@ def find_functions_with_single_quote_docstrings(file_list: list[str]) -> list[st
             dbl_quotes_docstring = re.search(r"\"\"\"[\s\S]*?\"\"\"", func_code)
             if not dbl_quotes_docstring:
                 single_quote_docstrings.append(function.__name__)
+                if len(single_quote_docstrings) == max_errors:
+                    break
 
     return single_quote_docstrings
 
@@ -126,26 +135,34 @@ def contains_main_function(py_filename: str) -> bool:
 def builtins_not_used_as_variable(function: FunctionType) -> bool:
     """
     Return True if no builtins are used as variables in the function, else return True
+
+    Raises InconclusiveCheckError if a regular expression ran out of its time budget
     """
     builtin_used_as_variable = r"^\s*(?:[^\s]*? ?, ?)*?{0} ?(?:\s*,\s*[^\W]+?\s*)*=.*"
     builtin_given_to_function = r"def {0}\((?:[^\s]*? ?, ?)*?{1}(?:\s*,\s*[^\W]+?)*\):"
     builtins_list = [
         word for word in dir(builtins) if word[0] not in string.ascii_uppercase + "_"
     ]
+    # Clean the function once instead of once per builtin
+    function_lines = get_clean_function_lines(function)
 
     # look for all possible builtin words used in the function
+    builtin_regexes = []
     for builtin_word in builtins_list:
         builtin_variable_regex = builtin_used_as_variable.format(builtin_word)
         builtin_paramater_regex = builtin_given_to_function.format(
             function.__name__, builtin_word
         )
 
-        combined_builtin_regex = f"({builtin_paramater_regex}|{builtin_variable_regex})"
+        builtin_regexes.append(f"({builtin_paramater_regex}|{builtin_variable_regex})")
 
-        if function_contains_regex(combined_builtin_regex, function):
-            return False
+    # All the builtins are searched together, so off the main thread this starts a single child process
+    try:
+        matching_line_indexes = search_patterns_within_budget(builtin_regexes, function_lines, find_all=False)
+    except RegexTimeoutError as error:
+        raise InconclusiveCheckError(f"Could not check {function.__name__} for builtins: {error}")
 
-    return True
+    return not any(matching_line_indexes)
 
 
 def function_contains_global_variable(function: FunctionType) -> bool:
@@ -242,48 +259,32 @@ def function_contains_list_comprehention(function: FunctionType) -> bool:
 
 def every_opened_file_is_closed(function: FunctionType) -> bool:
     """
-    Checks if a function closes all files it opens using open()
+    Checks if a function closes all files it opens using open() on every path out of the function
+    (use find_unclosed_files to get the unclosed handles and their lines)
 
     This does not count files opened using with statements
     """
+    return not find_unclosed_files(function)
+
 
-    # Get lines that open or close files
-    open_file_lines = get_function_regex_matches(OPEN_FILE_REGEX, function)
-    close_file_lines = get_function_regex_matches(CLOSE_FILE_REGEX, function)
-
-    # Dict to record files that are opened but not close
-    opened_file_variables: dict[str, int] = dict()
-
-    # Populate dict with variables to opened files
-    for line_content, line_number in open_file_lines:
-        variable_name = re.search(OPEN_FILE_REGEX, line_content)[1]
-        opened_file_variables[variable_name] = line_number
-    
-    # Remove variables that are closed after opening
-    for line_content, line_number in close_file_lines:
-        variable_name = CLOSE_FILE_REGEX.search(line_content)[1]
-        if variable_name in opened_file_variables and opened_file_variables[variable_name] < line_number:
-            del opened_file_variables[variable_name]
-    
-    # Return true if opened_file_variables is empty (no variables left unclosed)
-    return not bool(opened_file_variables)
-
-
-def find_missing_expected_files(file_list: list[str]) -> list[str]:
+def find_missing_expected_files(file_list: list[str], max_errors: int = None) -> list[str]:
     """
     Check if the user submitted the correct file name
 
     Returns a list of filenames that were wrongly named
+    When max_errors is given, stops looking once max_errors files were found
     """
     wrongly_named_files = []
     for filename in file_list:
         if not Path(filename).exists():
             wrongly_named_files.append(filename)
+            if len(wrongly_named_files) == max_errors:
+                break
     return wrongly_named_files
 
 
 def find_missing_expected_functions(
-    expected_functions_map: dict[str, list[str]]
+    expected_functions_map: dict[str, list[str]], max_errors: int = None
 ) -> list[str]:
     """
     Check if all of the expected functions in the submitted python file exist
@@ -292,6 +293,7 @@ def find_missing_expected_functions(
     expected functions in that file
 
     Returns a list of all missing functions
+    When max_errors is given, stops looking once max_errors functions were found
     """
     wrongly_named_functions = []
     for filename, functions in expected_functions_map.items():
@@ -305,11 +307,58 @@ def find_missing_expected_functions(
                 callable(getattr(user_file, function))
             except AttributeError:
                 wrongly_named_functions.append(function)
+                if len(wrongly_named_functions) == max_errors:
+                    return wrongly_named_functions
 
     return wrongly_named_functions
 
 
-def pep8_conformance(file_list: list[str]) -> dict[str, list[str]]:
+class _ErrorLimitReached(Exception):
+    """Raised by _Pep8Report to stop checking once enough errors were found"""
+
+
+class _Pep8Report(pep8.BaseReport):
+    """
+    Collects pep8 errors without printing them.
+
+    Stops the check once max_errors errors were found. Only the first max_messages messages
+    are kept, while every error is still counted per code.
+    """
+
+    def __init__(self, options, max_errors: int = None, max_messages: int = None):
+        super().__init__(options)
+        self.max_errors = max_errors
+        self.max_messages = max_messages
+        self.file_messages: dict[str, list[tuple[int, int, str, str]]] = defaultdict(list)
+        self.stored_messages = 0
+        self.code_counts = Counter()
+
+    def error(self, line_number, offset, text, check):
+        code = super().error(line_number, offset, text, check)
+        if code:
+            self.code_counts[code] += 1
+            if self.max_messages is None or self.stored_messages < self.max_messages:
+                self.file_messages[self.filename].append((line_number, offset, code, text[5:]))
+                self.stored_messages += 1
+            if self.total_errors == self.max_errors:
+                raise _ErrorLimitReached()
+        return code
+
+
+def _check_pep8(file_list: list[str], max_errors: int = None, max_messages: int = None) -> _Pep8Report:
+    """Runs pep8 on the files, stopping once max_errors errors were found"""
+    pep8style = pep8.StyleGuide()
+    report = pep8style.init_report(lambda options: _Pep8Report(options, max_errors, max_messages))
+
+    try:
+        pep8style.check_files(list(file_list))
+    except _ErrorLimitReached:
+        pass
+
+    return report
+
+
+def pep8_conformance(file_list: list[str], max_errors: int = None) -> dict[str, list[str]]:
     """
     Test that we conform to PEP8.
 
@@ -321,18 +370,37 @@ def pep8_conformance(file_list: list[str]) -> dict[str, list[str]]:
             "Row 9: Col 71: 'E202' whitespace before ')'"
         ]
     }
+
+    When max_errors is given, stops checking once max_errors errors were found
     """
+    report = _check_pep8(file_list, max_errors)
+
     errors = defaultdict(list)
-    pep8style = pep8.StyleGuide()
+    for filename, messages in report.file_messages.items():
+        for row, column, error_code, error_message in sorted(messages):
+            errors[filename].append(f"Row {row}: Col {column}: {error_code} {error_message}")
+
+    return errors
+
+
+def pep8_error_summary(
+    file_list: list[str], max_errors: int = None, max_examples: int = MAX_ERROR_EXAMPLES
+) -> tuple[int, Counter, list[str]]:
+    """
+    Counts the pep8 errors in the files without keeping every error message
+
+    When max_errors is given, stops counting once max_errors errors were found
+    (e.g. once the points deducted reached their maximum), otherwise counts every error.
+
+    Returns a tuple of (number of errors, Counter of errors per code, first max_examples error messages)
+    e.g. (2000, Counter({"W191": 1990, "E201": 10}), ["sample_test.py - Row 3: Col 0: W191 indentation contains tabs"])
+    """
+    report = _check_pep8(file_list, max_errors, max_examples)
+
+    examples = [
+        f"{filename} - Row {row}: Col {column}: {error_code} {error_message}"
+        for filename, messages in report.file_messages.items()
+        for row, column, error_code, error_message in messages
+    ]
 
-    # We loop and test the files for pep8 conformance one by one because otherwise
-    # we won't be able to map errors to the file they came from
-    for python_module in file_list:
-        result = pep8style.check_files([python_module])
-        if result.total_errors != 0:
-            for row, column, error_code, error_message, _ in result._deferred_print:
-                errors[result.filename].append(
-                    f"Row {row}: Col {column}: {error_code} {error_message}"
-                )
-
-    return errors
\ No newline at end of file
+    return report.total_errors, report.code_counts, examples
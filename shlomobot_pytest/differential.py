@@ -0,0 +1,290 @@
+"""
+This module contains functions to test the trainee's functions against a reference implementation
+on many generated inputs (differential testing)
+"""
+
+# ================= IMPORTS =================
+
+import copy
+import os
+import pickle
+import random
+import signal
+import time
+import operator
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator
+from types import FunctionType
+from shlomobot_pytest.utils import alarm_timeout
+
+# ================= CONSTANTS =================
+
+RETURNED = "returned"
+RAISED = "raised"
+TIMED_OUT = "timed out"
+MAX_SHRINK_ATTEMPTS = 1000
+# Shrinking a failing case may take at most this many case timeouts
+SHRINK_TIME_FACTOR = 5
+MAX_REPR_LENGTH = 200
+
+
+class CaseTimeoutError(Exception):
+    """Raised inside a case that ran for longer than its timeout"""
+
+
+def run_case(function: FunctionType | Callable, arguments: tuple, timeout: float = None) -> tuple[str, Any]:
+    """
+    Runs a single case and returns its outcome as a (kind, value) pair:
+    (RETURNED, return value), (RAISED, exception type name) or (TIMED_OUT, None)
+
+    The timeout is only enforced in the main thread of platforms that support SIGALRM
+    """
+    can_time_out = (
+        timeout is not None
+        and hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+
+    try:
+        with alarm_timeout(timeout, CaseTimeoutError) if can_time_out else nullcontext():
+            return RETURNED, function(*copy.deepcopy(arguments))
+    except CaseTimeoutError:
+        return TIMED_OUT, None
+    except (Exception, SystemExit) as error:
+        # SystemExit (e.g. from exit()) is an outcome of the case like any other error
+        return RAISED, type(error).__name__
+
+
+def outcomes_match(
+    outcome: tuple[str, Any],
+    expected_outcome: tuple[str, Any],
+    compare: Callable[[Any, Any], bool] = operator.eq,
+) -> bool:
+    """
+    Checks if the outcome of a case matches the expected outcome.
+    Return values are compared with compare, raised exceptions are compared by type
+    """
+    kind, value = outcome
+    expected_kind, expected_value = expected_outcome
+    if kind != expected_kind:
+        return False
+    if kind == RETURNED:
+        try:
+            return bool(compare(value, expected_value))
+        except Exception:
+            return False
+
+    return value == expected_value
+
+
+def _find_first_failing_case(
+    function: FunctionType | Callable,
+    reference_function: FunctionType | Callable,
+    cases: list[tuple],
+    case_timeout: float,
+    compare: Callable[[Any, Any], bool],
+) -> tuple[tuple, tuple[str, Any], tuple[str, Any]] | None:
+    """
+    Runs the cases in order and returns the first failing case as
+    (arguments, outcome, expected outcome), or None if all cases pass.
+    Cases on which the reference function times out are skipped.
+    """
+    for arguments in cases:
+        expected_outcome = run_case(reference_function, arguments, case_timeout)
+        if expected_outcome[0] == TIMED_OUT:
+            continue
+        outcome = run_case(function, arguments, case_timeout)
+        if not outcomes_match(outcome, expected_outcome, compare):
+            return arguments, outcome, expected_outcome
+
+    return None
+
+
+def _is_picklable(*objects) -> bool:
+    """Checks if all objects can be sent to a worker process"""
+    try:
+        pickle.dumps(objects)
+        return True
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+
+
+def _shrink_value(value: Any) -> Iterator[Any]:
+    """Yields simpler candidates for a value, simplest first"""
+    if isinstance(value, bool):
+        if value:
+            yield False
+    elif isinstance(value, int):
+        if value != 0:
+            yield 0
+            yield int(value / 2)
+            yield value - 1 if value > 0 else value + 1
+    elif isinstance(value, float):
+        if value != 0:
+            yield 0.0
+            if value != int(value):
+                yield float(int(value))
+            yield value / 2
+    elif isinstance(value, (str, list, tuple)):
+        if len(value) > 0:
+            yield value[:0]
+            yield value[: len(value) // 2]
+            yield value[len(value) // 2:]
+            for index in range(len(value)):
+                yield value[:index] + value[index + 1:]
+        if isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                for simpler_item in _shrink_value(item):
+                    yield value[:index] + type(value)([simpler_item]) + value[index + 1:]
+    elif isinstance(value, dict):
+        for key in value:
+            yield {other_key: item for other_key, item in value.items() if other_key != key}
+        for key, item in value.items():
+            for simpler_item in _shrink_value(item):
+                yield {**value, key: simpler_item}
+
+
+def shrink_failing_case(
+    function: FunctionType | Callable,
+    reference_function: FunctionType | Callable,
+    failing_case: tuple[tuple, tuple[str, Any], tuple[str, Any]],
+    case_timeout: float = 1.0,
+    compare: Callable[[Any, Any], bool] = operator.eq,
+    max_shrink_seconds: float = None,
+) -> tuple[tuple, tuple[str, Any], tuple[str, Any]]:
+    """
+    Greedily simplifies the arguments of a failing (arguments, outcome, expected outcome) case
+    while the case keeps failing, for at most MAX_SHRINK_ATTEMPTS candidates and max_shrink_seconds
+    (SHRINK_TIME_FACTOR case timeouts by default)
+
+    Returns the minimal failing case that was found, which is the given case when it cannot be simplified
+    (e.g. the failure does not reproduce, or the function timed out on it)
+    """
+    if failing_case[1][0] == TIMED_OUT:
+        # Every candidate would most likely wait out the whole case timeout as well
+        return failing_case
+
+    if max_shrink_seconds is None:
+        max_shrink_seconds = SHRINK_TIME_FACTOR * case_timeout
+    deadline = time.monotonic() + max_shrink_seconds
+    attempts = 0
+
+    def can_keep_shrinking() -> bool:
+        return attempts < MAX_SHRINK_ATTEMPTS and time.monotonic() < deadline
+
+    shrunk = True
+    while shrunk and can_keep_shrinking():
+        shrunk = False
+        for index, argument in enumerate(failing_case[0]):
+            for simpler_argument in _shrink_value(argument):
+                attempts += 1
+                candidate = failing_case[0][:index] + (simpler_argument,) + failing_case[0][index + 1:]
+                candidate_failure = _find_first_failing_case(
+                    function, reference_function, [candidate], case_timeout, compare
+                )
+                # Only keep candidates the reference handles the same way, so that shrinking
+                # does not turn a wrong result into an input that is invalid for the reference,
+                # and that the function does not time out on
+                if (
+                    candidate_failure is not None
+                    and candidate_failure[2][0] == failing_case[2][0]
+                    and candidate_failure[1][0] != TIMED_OUT
+                ):
+                    failing_case = candidate_failure
+                    shrunk = True
+                    break
+                if not can_keep_shrinking():
+                    break
+            if shrunk or not can_keep_shrinking():
+                break
+
+    return failing_case
+
+
+def find_differential_failure(
+    function: FunctionType | Callable,
+    reference_function: FunctionType | Callable,
+    input_generator: Callable[[random.Random], tuple],
+    number_of_cases: int = 1000,
+    batch_size: int = 100,
+    workers: int = None,
+    case_timeout: float = 1.0,
+    seed: int = 0,
+    compare: Callable[[Any, Any], bool] = operator.eq,
+    shrink: bool = True,
+) -> tuple[tuple, tuple[str, Any], tuple[str, Any]] | None:
+    """
+    Runs the function and the reference function on generated inputs and compares their outcomes
+
+    input_generator receives a random.Random instance and returns a tuple of positional arguments.
+    The cases are run in batches across a pool of worker processes (workers defaults to the number
+    of CPUs, use workers=1 to run in the current process). Functions that cannot be sent to a
+    worker process (e.g. lambdas) are run in the current process.
+
+    Returns the first failing case as (arguments, outcome, expected outcome), shrunk to
+    a minimal counterexample, or None if all the cases pass
+    """
+    generator_random = random.Random(seed)
+    cases = [input_generator(generator_random) for _ in range(number_of_cases)]
+    batches = [cases[index: index + batch_size] for index in range(0, len(cases), batch_size)]
+
+    workers = workers or os.cpu_count() or 1
+    failing_case = None
+    if workers == 1 or len(batches) == 1 or not _is_picklable(function, reference_function, compare, cases):
+        for batch in batches:
+            failing_case = _find_first_failing_case(function, reference_function, batch, case_timeout, compare)
+            if failing_case is not None:
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            futures = [
+                executor.submit(
+                    _find_first_failing_case, function, reference_function, batch, case_timeout, compare
+                )
+                for batch in batches
+            ]
+            # Go over the batches in order so the reported failure does not depend on scheduling
+            for future in futures:
+                failing_case = future.result()
+                if failing_case is not None:
+                    break
+            for future in futures:
+                future.cancel()
+
+    if failing_case is not None and shrink:
+        failing_case = shrink_failing_case(function, reference_function, failing_case, case_timeout, compare)
+
+    return failing_case
+
+
+def _short_repr(value: Any) -> str:
+    """Returns the repr of a value, truncated to MAX_REPR_LENGTH characters"""
+    value_repr = repr(value)
+    if len(value_repr) > MAX_REPR_LENGTH:
+        value_repr = value_repr[:MAX_REPR_LENGTH] + "..."
+
+    return value_repr
+
+
+def describe_outcome(outcome: tuple[str, Any]) -> str:
+    """Returns a human readable description of a case outcome"""
+    kind, value = outcome
+    if kind == RETURNED:
+        return f"returned {_short_repr(value)}"
+    if kind == RAISED:
+        return f"raised {value}"
+
+    return "did not finish in time"
+
+
+def describe_failing_case(function_name: str, failing_case: tuple[tuple, tuple[str, Any], tuple[str, Any]]) -> str:
+    """Returns a feedback message describing a failing case"""
+    arguments, outcome, expected_outcome = failing_case
+    arguments_string = ", ".join(_short_repr(argument) for argument in arguments)
+
+    return (
+        f"{function_name}({arguments_string}) {describe_outcome(outcome)}, "
+        f"but it should have {describe_outcome(expected_outcome)}"
+    )
@@ -0,0 +1,72 @@
+"""
+This module contains the input-output fixtures of shlomobot_pytest.utils.
+They are kept apart so that importing utils (e.g. by the shlomobot-pretest command) does not import pytest,
+and can still be imported from shlomobot_pytest.utils
+"""
+
+# ================= IMPORTS =================
+
+import sys
+import pytest
+from io import StringIO
+from shlomobot_pytest.utils import MAX_OUTPUT_CHARS, StreamingOutputComparer, run_python_io
+
+
+@pytest.fixture()
+def simulate_python_io(monkeypatch, capsys: pytest.CaptureFixture):
+    """
+    A fixture to simulate input-output of a python file.
+    This should be called with the python filename parameter, and than the input(s) as *args.
+    Each given argument is equivalent to 1 line of input (splitted by \\n)
+    """
+
+    def wrapper(*args, pyfile):
+        send_input_string = ""
+
+        # Converting args to list, to maintain the order of the recived inputs.
+        for item in args:
+            send_input_string += str(item) + "\n"
+        monkeypatch.setattr(sys, "stdin", StringIO(send_input_string))
+
+        with open(pyfile, "r") as f:
+            exec(f.read())
+        user_output = capsys.readouterr().out
+        return user_output
+
+    return wrapper
+
+
+@pytest.fixture()
+def simulate_python_io_compare():
+    """
+    A fixture to run a python file with the given input(s) and compare its output to the expected output.
+    This should be called with the input(s) as *args, and the python filename and expected output as keywords.
+    Each given argument is equivalent to 1 line of input (splitted by \\n)
+
+    The output is compared while the program runs, so a wrong or endless output stops the program early.
+    Returns a tuple of (whether the output matches, feedback about the first differing line)
+    """
+
+    def wrapper(
+        *args,
+        pyfile: str,
+        expected_output: str,
+        max_output_chars: int = MAX_OUTPUT_CHARS,
+        ignore_case: bool = False,
+        normalise_whitespace: bool = False,
+        ignore_trailing_newlines: bool = True,
+    ) -> tuple[bool, str]:
+        output_comparer = StreamingOutputComparer(
+            expected_output, max_output_chars, ignore_case, normalise_whitespace, ignore_trailing_newlines
+        )
+
+        try:
+            run_python_io(pyfile, *args, output=output_comparer)
+        except EOFError:
+            if not output_comparer.feedback:
+                output_comparer.feedback = "The program asked for more input than was given"
+
+        feedback = output_comparer.finish()
+        return feedback == "", feedback
+
+    return wrapper
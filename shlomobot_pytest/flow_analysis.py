@@ -0,0 +1,244 @@
+"""
+This module contains a statement level control flow analysis of the files a function opens with open()
+"""
+
+# ================= IMPORTS =================
+
+import ast
+import inspect
+import textwrap
+from types import FunctionType
+
+# ================= CONSTANTS =================
+
+LOOP_STATEMENTS = (ast.For, ast.AsyncFor, ast.While)
+WITH_STATEMENTS = (ast.With, ast.AsyncWith)
+NESTED_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+def _merge_states(*states: dict[str, int] | None) -> dict[str, int] | None:
+    """
+    Merges the open handles of several paths: a handle is open if it is open on any path.
+    None stands for a path that does not continue (e.g. it returned)
+    """
+    continuing_states = [state for state in states if state is not None]
+    if not continuing_states:
+        return None
+
+    merged_state = {}
+    for state in continuing_states:
+        for handle, line_number in state.items():
+            merged_state[handle] = min(line_number, merged_state.get(handle, line_number))
+
+    return merged_state
+
+
+def _is_open_call(node: ast.AST) -> bool:
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "open"
+
+
+def _walk_without_nested_scopes(node: ast.AST):
+    """Yields the node and its descendants, without going into nested functions, classes and lambdas"""
+    nodes_to_visit = [node]
+    while nodes_to_visit:
+        current_node = nodes_to_visit.pop()
+        yield current_node
+        nodes_to_visit.extend(
+            child for child in ast.iter_child_nodes(current_node) if not isinstance(child, NESTED_SCOPES)
+        )
+
+
+class _FileHandleTracker:
+    """
+    Follows the handles returned by open() through every path of a function.
+
+    The state of a path is a dictionary of the open handles (e.g. "f" or "self.log_file")
+    mapped to the line they were opened on, or None once the path stopped (return, raise, break, continue).
+    """
+
+    def __init__(self):
+        self.unclosed_files: set[tuple[str, int]] = set()
+        # finally bodies of the try statements around the current statement, innermost last
+        self.finally_bodies: list[list[ast.stmt]] = []
+        # (break states, continue states, number of finally bodies around the loop) of the loops
+        # around the current statement, innermost last
+        self.loop_exits: list[tuple[list[dict[str, int]], list[dict[str, int]], int]] = []
+
+    def report(self, state: dict[str, int]):
+        self.unclosed_files.update(state.items())
+
+    def run_block(self, statements: list[ast.stmt], state: dict[str, int] | None) -> dict[str, int] | None:
+        for statement in statements:
+            if state is None:
+                break
+            state = self.run_statement(statement, dict(state))
+        return state
+
+    def close_handles(self, node: ast.AST, state: dict[str, int]):
+        """Removes the handles closed anywhere in the node (e.g. `f.close()`)"""
+        for child in _walk_without_nested_scopes(node):
+            if (
+                isinstance(child, ast.Call)
+                and isinstance(child.func, ast.Attribute)
+                and child.func.attr == "close"
+            ):
+                state.pop(ast.unparse(child.func.value), None)
+
+    def run_finally_bodies(self, state: dict[str, int], depth: int) -> dict[str, int] | None:
+        """Runs the finally bodies that a jump out of the current statement passes, innermost first,
+        down to the given number of enclosing finally bodies (0 for a return)"""
+        finally_bodies = self.finally_bodies
+        for index in range(len(finally_bodies) - 1, depth - 1, -1):
+            self.finally_bodies = finally_bodies[:index]
+            state = self.run_block(finally_bodies[index], state)
+            if state is None:
+                break
+        self.finally_bodies = finally_bodies
+
+        return state
+
+    def exit_function(self, state: dict[str, int], returned_value: ast.AST = None):
+        """Reports the handles that are still open once the finally bodies around a return were run"""
+        state = self.run_finally_bodies(state, 0)
+        if state is None:
+            return
+        if returned_value is not None:
+            # Returning a handle passes the responsibility to close it to the caller
+            # (`return f` or `return [f]` do, `return f.read()` does not)
+            accessed_nodes = {
+                id(node.value)
+                for node in _walk_without_nested_scopes(returned_value)
+                if isinstance(node, ast.Attribute)
+            }
+            returned_names = {
+                ast.unparse(node)
+                for node in _walk_without_nested_scopes(returned_value)
+                if id(node) not in accessed_nodes
+            }
+            state = {handle: line for handle, line in state.items() if handle not in returned_names}
+        self.report(state)
+
+    def run_statement(self, statement: ast.stmt, state: dict[str, int]) -> dict[str, int] | None:
+        if isinstance(statement, NESTED_SCOPES):
+            return state
+
+        if isinstance(statement, (ast.Assign, ast.AnnAssign)):
+            self.close_handles(statement.value or statement, state)
+            targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+            for target in targets:
+                handle = ast.unparse(target)
+                if handle in state:
+                    # The handle is replaced before it was closed
+                    self.report({handle: state.pop(handle)})
+                if _is_open_call(statement.value) and isinstance(target, (ast.Name, ast.Attribute)):
+                    state[handle] = statement.lineno
+            return state
+
+        if isinstance(statement, ast.Return):
+            if statement.value is not None:
+                self.close_handles(statement.value, state)
+            self.exit_function(state, statement.value)
+            return None
+
+        if isinstance(statement, ast.Raise):
+            # Files left open on an error path are not reported
+            return None
+
+        if isinstance(statement, (ast.Break, ast.Continue)):
+            if self.loop_exits:
+                break_states, continue_states, loop_depth = self.loop_exits[-1]
+                # Leaving a try or with block inside the loop runs its finally body or closes its handle
+                state = self.run_finally_bodies(state, loop_depth)
+                if state is not None:
+                    (break_states if isinstance(statement, ast.Break) else continue_states).append(state)
+            return None
+
+        if isinstance(statement, ast.If):
+            self.close_handles(statement.test, state)
+            return _merge_states(
+                self.run_block(statement.body, dict(state)),
+                self.run_block(statement.orelse, dict(state)),
+            )
+
+        if isinstance(statement, LOOP_STATEMENTS):
+            is_for_loop = isinstance(statement, (ast.For, ast.AsyncFor))
+            self.close_handles(statement.iter if is_for_loop else statement.test, state)
+            break_states, continue_states = [], []
+            self.loop_exits.append((break_states, continue_states, len(self.finally_bodies)))
+            body_state = self.run_block(statement.body, dict(state))
+            # The body runs again from the end of the first iteration, so that a handle the body reopens
+            # before closing the previous one is reported
+            next_iteration_state = _merge_states(body_state, *continue_states)
+            if next_iteration_state is not None:
+                body_state = _merge_states(body_state, self.run_block(statement.body, next_iteration_state))
+            self.loop_exits.pop()
+
+            if not is_for_loop and isinstance(statement.test, ast.Constant) and statement.test.value:
+                # `while True:` only ends with a break
+                return _merge_states(*break_states)
+            # The body may run zero or more times
+            loop_end_state = _merge_states(state, body_state, *continue_states)
+            return _merge_states(self.run_block(statement.orelse, loop_end_state), *break_states)
+
+        if isinstance(statement, WITH_STATEMENTS):
+            for item in statement.items:
+                if not _is_open_call(item.context_expr):
+                    self.close_handles(item.context_expr, state)
+            # `with f:` closes f at the end of the block, also when the block returns
+            closing_body = [
+                ast.Expr(
+                    ast.Call(ast.Attribute(item.context_expr, "close", ast.Load()), args=[], keywords=[])
+                )
+                for item in statement.items
+                if not _is_open_call(item.context_expr)
+            ]
+            self.finally_bodies.append(closing_body)
+            state = self.run_block(statement.body, state)
+            self.finally_bodies.pop()
+            return self.run_block(closing_body, state)
+
+        if isinstance(statement, ast.Try) or type(statement).__name__ == "TryStar":
+            self.finally_bodies.append(statement.finalbody)
+            body_state = self.run_block(statement.body, dict(state))
+            # The handles opened in the body are not known to be open in a handler, since the exception
+            # may come from open() itself. If they are never closed, the path through the body reports them
+            handler_states = [self.run_block(handler.body, dict(state)) for handler in statement.handlers]
+            else_state = self.run_block(statement.orelse, body_state)
+            self.finally_bodies.pop()
+            return self.run_block(statement.finalbody, _merge_states(else_state, *handler_states))
+
+        if type(statement).__name__ == "Match":
+            self.close_handles(statement.subject, state)
+            case_states = [self.run_block(case.body, dict(state)) for case in statement.cases]
+            last_case = statement.cases[-1]
+            if (
+                isinstance(last_case.pattern, ast.MatchAs)
+                and last_case.pattern.pattern is None
+                and last_case.guard is None
+            ):
+                return _merge_states(*case_states)
+            # Without an unguarded catch-all case, the match may run none of the cases
+            return _merge_states(state, *case_states)
+
+        self.close_handles(statement, state)
+        return state
+
+
+def find_unclosed_files(function: FunctionType) -> list[tuple[str, int]]:
+    """
+    Returns a (handle, line number) tuple for every file the function opens with `handle = open(...)`
+    and does not close on every path out of the function.
+    The line number is within the function's source, where the first line is 1.
+
+    Closing a file inside a finally block or with a `with handle:` block counts, returning the handle
+    passes it on to the caller, and files opened using with statements are not tracked.
+    """
+    function_code = textwrap.dedent(inspect.getsource(function))
+    function_definition = ast.parse(function_code).body[0]
+
+    tracker = _FileHandleTracker()
+    end_state = tracker.run_block(function_definition.body, {})
+    if end_state is not None:
+        tracker.exit_function(end_state)
+
+    return sorted(tracker.unclosed_files, key=lambda unclosed_file: (unclosed_file[1], unclosed_file[0]))
@@ -0,0 +1,214 @@
+"""
+This module contains an expect-style session to test programs whose input depends on their earlier output
+"""
+
+# ================= IMPORTS =================
+
+import os
+import re
+import codecs
+import sys
+import time
+import selectors
+import subprocess
+import pytest
+from shlomobot_pytest.utils import MAX_OUTPUT_CHARS
+
+# ================= CONSTANTS =================
+
+DEFAULT_STEP_TIMEOUT = 5.0
+READ_CHUNK_SIZE = 4096
+SENT = "sent"
+RECEIVED = "received"
+
+
+class InteractiveSessionError(Exception):
+    """Raised when the program does not behave as expected during an interactive session"""
+
+
+class InteractiveSession:
+    """
+    Runs a python file in a subprocess and talks to it over non-blocking pipes.
+
+    Example:
+    with InteractiveSession("sample_test.py") as session:
+        session.expect("What is your name? ")
+        session.send("Shlomo")
+        session.expect("Hello Shlomo")
+
+    Every step waits at most step_timeout seconds, so a program that waits for input
+    or prints something unexpected fails with clear feedback instead of hanging.
+    A program that prints more than max_output_chars characters in total fails the step as well.
+    """
+
+    def __init__(
+        self,
+        pyfile: str,
+        step_timeout: float = DEFAULT_STEP_TIMEOUT,
+        cwd: str = None,
+        max_output_chars: int = MAX_OUTPUT_CHARS,
+    ):
+        self.pyfile = pyfile
+        self.step_timeout = step_timeout
+        self.max_output_chars = max_output_chars
+        self.output_chars = 0
+        self.output = ""
+        # List of (seconds since start, SENT or RECEIVED, text)
+        self.transcript: list[tuple[float, str, str]] = []
+        self.start_time = time.monotonic()
+
+        # -u so that prompts written without a newline are not stuck in the program's buffer
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", pyfile],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+        )
+        os.set_blocking(self.process.stdout.fileno(), False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.process.stdout, selectors.EVENT_READ)
+        self.output_ended = False
+        # Decodes characters whose bytes are split between chunks once all their bytes arrived
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def __enter__(self) -> "InteractiveSession":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _record(self, direction: str, text: str):
+        self.transcript.append((time.monotonic() - self.start_time, direction, text))
+
+    def _read_available(self, timeout: float) -> bool:
+        """
+        Reads the output that becomes available within timeout seconds. Returns False once the output ended
+
+        Raises InteractiveSessionError once the program printed more than max_output_chars characters
+        """
+        if self.output_chars > self.max_output_chars:
+            raise InteractiveSessionError(f"The output is longer than the limit of {self.max_output_chars} characters")
+        if self.output_ended:
+            return False
+
+        if self.selector.select(timeout):
+            chunk = self.process.stdout.read(READ_CHUNK_SIZE)
+            # A non-blocking read returns None when there is nothing to read yet, and b"" once the output ended
+            if chunk is None:
+                return True
+            text = self.decoder.decode(chunk, final=chunk == b"")
+            if text:
+                self.output_chars += len(text)
+                self.output += text
+                self._record(RECEIVED, text)
+            if chunk == b"":
+                self.output_ended = True
+                return False
+
+        return True
+
+    def expect(self, pattern: str | re.Pattern, timeout: float = None) -> re.Match:
+        """
+        Waits until the output contains the pattern (a plain string, or a compiled regular expression)
+        and consumes the output up to the end of the match.
+
+        Raises InteractiveSessionError if the pattern does not appear within the timeout
+        or the program ends before printing it
+        """
+        if not isinstance(pattern, re.Pattern):
+            pattern = re.compile(re.escape(pattern))
+        timeout = self.step_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            match = pattern.search(self.output)
+            if match:
+                self.output = self.output[match.end():]
+                return match
+
+            remaining_time = deadline - time.monotonic()
+            if remaining_time <= 0:
+                raise InteractiveSessionError(
+                    f"Expected the output {pattern.pattern!r} within {timeout} seconds, "
+                    f"but the program printed {self.output!r} (it may be waiting for input)"
+                )
+            if not self._read_available(remaining_time):
+                raise InteractiveSessionError(
+                    f"Expected the output {pattern.pattern!r}, but the program ended after printing {self.output!r}"
+                )
+
+    def send(self, line: str):
+        """Sends a line of input to the program"""
+        text = str(line) + "\n"
+        self._record(SENT, text)
+        try:
+            self.process.stdin.write(text.encode())
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise InteractiveSessionError(f"Could not send {line!r}, the program already ended")
+
+    def close(self, timeout: float = None) -> int:
+        """
+        Closes the program's input and waits for it to end, killing it after the timeout.
+        Returns the exit code of the program
+        """
+        if self.process.stdout.closed:
+            return self.process.returncode
+
+        timeout = self.step_timeout if timeout is None else timeout
+        if not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        deadline = time.monotonic() + timeout
+        try:
+            while time.monotonic() < deadline and self._read_available(deadline - time.monotonic()):
+                pass
+        except InteractiveSessionError:
+            # The output went over the limit, there is no point in waiting for the program to end
+            self.process.kill()
+
+        try:
+            self.process.wait(max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+        self.selector.close()
+        self.process.stdout.close()
+
+        return self.process.returncode
+
+    def format_transcript(self) -> str:
+        """Returns the transcript as readable text, e.g. `[0.01s] > 5`"""
+        direction_markers = {SENT: ">", RECEIVED: "<"}
+
+        return "\n".join(
+            f"[{elapsed:.2f}s] {direction_markers[direction]} {text.rstrip()}"
+            for elapsed, direction, text in self.transcript
+        )
+
+
+@pytest.fixture()
+def interactive_python_io():
+    """
+    A fixture to start interactive sessions with python files.
+    This should be called with the python filename, and returns an InteractiveSession.
+    Sessions that are still running are closed when the test ends
+    """
+    sessions = []
+
+    def wrapper(
+        pyfile: str, step_timeout: float = DEFAULT_STEP_TIMEOUT, max_output_chars: int = MAX_OUTPUT_CHARS
+    ) -> InteractiveSession:
+        session = InteractiveSession(pyfile, step_timeout, max_output_chars=max_output_chars)
+        sessions.append(session)
+        return session
+
+    yield wrapper
+
+    for session in sessions:
+        session.close()
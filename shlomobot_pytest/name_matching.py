@@ -0,0 +1,174 @@
+"""
+This module contains functions to suggest the intended name of a wrongly named file or function
+(e.g. "mian" instead of "main"), using a BK-tree over the submitted names
+"""
+
+# ================= IMPORTS =================
+
+from pathlib import Path
+from shlomobot_pytest.utils import import_pyfile, extract_functions
+
+# ================= CONSTANTS =================
+
+MAX_SUGGESTION_DISTANCE = 2
+
+
+def edit_distance(word: str, other_word: str, max_distance: int = None) -> int:
+    """
+    Returns the Levenshtein distance between two words.
+    When max_distance is given, stops early and returns max_distance + 1 once the distance is known to be larger
+    """
+    if len(word) < len(other_word):
+        word, other_word = other_word, word
+    if max_distance is not None and len(word) - len(other_word) > max_distance:
+        return max_distance + 1
+
+    previous_row = list(range(len(other_word) + 1))
+    for row_index, character in enumerate(word, 1):
+        current_row = [row_index]
+        for column_index, other_character in enumerate(other_word, 1):
+            current_row.append(
+                min(
+                    previous_row[column_index] + 1,
+                    current_row[column_index - 1] + 1,
+                    previous_row[column_index - 1] + (character != other_character),
+                )
+            )
+        if max_distance is not None and min(current_row) > max_distance:
+            return max_distance + 1
+        previous_row = current_row
+
+    return previous_row[-1]
+
+
+class BKTree:
+    """
+    Indexes words by their edit distance, so that the words close to a given word are found
+    without comparing it to every word in the index.
+
+    Words are compared case-insensitively, and the original spelling is returned.
+    """
+
+    def __init__(self, words: list[str] = ()):
+        # Each node is [word, original words, {distance: child node}]
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, original_word: str):
+        word = original_word.lower()
+        if self.root is None:
+            self.root = [word, [original_word], {}]
+            return
+
+        node = self.root
+        while True:
+            node_word, original_words, children = node
+            distance = edit_distance(word, node_word)
+            if distance == 0:
+                if original_word not in original_words:
+                    original_words.append(original_word)
+                return
+            if distance not in children:
+                children[distance] = [word, [original_word], {}]
+                return
+            node = children[distance]
+
+    def search(self, original_word: str, max_distance: int = MAX_SUGGESTION_DISTANCE) -> list[tuple[int, str]]:
+        """Returns the (distance, word) pairs within max_distance of the word, closest first"""
+        if self.root is None:
+            return []
+
+        word = original_word.lower()
+        matches = []
+        nodes_to_visit = [self.root]
+        while nodes_to_visit:
+            node_word, original_words, children = nodes_to_visit.pop()
+            distance = edit_distance(word, node_word)
+            if distance <= max_distance:
+                matches.extend((distance, match) for match in original_words if match != original_word)
+            # By the triangle inequality, only children at distance - max_distance to distance + max_distance can match
+            lowest_child_distance = distance - max_distance
+            highest_child_distance = distance + max_distance
+            nodes_to_visit.extend(
+                child
+                for child_distance, child in children.items()
+                if lowest_child_distance <= child_distance <= highest_child_distance
+            )
+
+        return sorted(matches)
+
+
+def suggest_names(
+    names: list[str], candidates: list[str], max_distance: int = MAX_SUGGESTION_DISTANCE
+) -> dict[str, list[str]]:
+    """
+    Returns a dictionary mapping each name that has close candidates to those candidates, closest first
+    e.g. suggest_names(["mian"], ["main", "helper"]) returns {"mian": ["main"]}
+    """
+    candidates_tree = BKTree(candidates)
+    suggestions = {}
+    for name in names:
+        matches = [match for _, match in candidates_tree.search(name, max_distance)]
+        if matches:
+            suggestions[name] = matches
+
+    return suggestions
+
+
+def suggest_file_names(
+    expected_files: list[str],
+    missing_files: list[str],
+    directory: str = ".",
+    max_distance: int = MAX_SUGGESTION_DISTANCE,
+) -> dict[str, list[str]]:
+    """
+    Suggests submitted python files for expected files that are missing
+    e.g. {"solution.py": ["Solution.py"]}
+    Expected files are never suggested, so a missing file is not mistaken for a typo of another expected file
+    """
+    submitted_files = [
+        path.name
+        for path in Path(directory).glob("*.py")
+        if path.is_file() and path.name not in expected_files
+    ]
+
+    return suggest_names(missing_files, submitted_files, max_distance)
+
+
+def suggest_function_names(
+    expected_functions_map: dict[str, list[str]],
+    missing_functions: list[str],
+    max_distance: int = MAX_SUGGESTION_DISTANCE,
+) -> dict[str, list[str]]:
+    """
+    Suggests functions defined in the submitted files for expected functions that are missing
+    e.g. {"main": ["mian"]}
+    Functions the file is expected to define are never suggested
+    """
+    suggestions = {}
+    for filename, functions in expected_functions_map.items():
+        missing_file_functions = [function for function in functions if function in missing_functions]
+        if not missing_file_functions:
+            continue
+
+        defined_functions = [
+            function.__name__
+            for function in extract_functions(import_pyfile(filename))
+            if function.__name__ not in functions
+        ]
+        for function, matches in suggest_names(missing_file_functions, defined_functions, max_distance).items():
+            suggestions.setdefault(function, []).extend(matches)
+
+    return suggestions
+
+
+def describe_missing_names(missing_names: list[str], suggestions: dict[str, list[str]]) -> str:
+    """
+    Returns the missing names with their suggestions for the feedback
+    e.g. "main (did you name it mian?), helper"
+    """
+    return ", ".join(
+        f"{name} (did you name it {' or '.join(suggestions[name])}?)" if name in suggestions else name
+        for name in missing_names
+    )
@@ -0,0 +1,315 @@
+"""
+This module contains helper functions to measure the performance of the trainee's functions
+"""
+
+# ================= IMPORTS =================
+
+import copy
+import math
+import time
+import signal
+import threading
+import tracemalloc
+from contextlib import nullcontext
+from statistics import median
+from typing import Callable
+from types import FunctionType
+from shlomobot_pytest.utils import alarm_timeout
+
+# ================= CONSTANTS =================
+
+# Complexity classes ordered from the slowest growing to the fastest growing
+COMPLEXITY_CLASSES: dict[str, Callable[[int], float]] = {
+    "O(1)": lambda n: 1.0,
+    "O(log n)": lambda n: math.log2(n),
+    "O(n)": lambda n: float(n),
+    "O(n log n)": lambda n: n * math.log2(n),
+    "O(n^2)": lambda n: float(n) ** 2,
+    "O(n^3)": lambda n: float(n) ** 3,
+}
+# How much the empirical order of growth may exceed the expected class's order before failing,
+# to absorb timing noise (e.g. a slope of 1.2 still passes for O(n))
+COMPLEXITY_ORDER_TOLERANCE = 0.3
+# Calls faster than this many seconds are timed in batches, like timeit's autorange
+MIN_TIMED_SECONDS = 0.01
+# The input size stops growing (and a size stops being repeated) once a call takes longer than this many seconds
+MAX_CALL_SECONDS = 1.0
+# Measuring the complexity of a function may take at most this many seconds
+MAX_MEASURE_SECONDS = 60.0
+# The least number of input sizes needed to fit an order of growth
+MIN_FIT_SIZES = 3
+# Timings further than this many median absolute deviations from the median are rejected as outliers
+OUTLIER_MAD_THRESHOLD = 3.0
+# Peak allocations below this amount of bytes are rounded up to it, to avoid comparing against ~0 bytes
+MIN_PEAK_MEMORY_BYTES = 1024
+
+
+class ComplexityTimeoutError(Exception):
+    """Raised when measuring the complexity of a function takes longer than its time limit"""
+
+
+def generate_input_sizes(min_size: int, growth_factor: int, number_of_sizes: int) -> list[int]:
+    """
+    Returns a geometric series of input sizes
+
+    e.g. generate_input_sizes(100, 2, 4) returns [100, 200, 400, 800]
+    """
+    return [min_size * growth_factor**index for index in range(number_of_sizes)]
+
+
+def _time_calls(function: FunctionType | Callable, arguments: tuple, number_of_calls: int) -> float:
+    """Returns the wall time in seconds of calling the function number_of_calls times on the same arguments"""
+    start = time.perf_counter()
+    for _ in range(number_of_calls):
+        function(*arguments)
+
+    return time.perf_counter() - start
+
+
+def time_function_call(
+    function: FunctionType | Callable,
+    input_generator: Callable[[int], tuple],
+    size: int,
+    repeats: int = 5,
+    warmup: int = 1,
+    max_call_seconds: float = MAX_CALL_SECONDS,
+) -> list[float]:
+    """
+    Times the function on freshly generated inputs of the given size.
+
+    input_generator receives the input size and returns a tuple of positional arguments.
+    A new input is generated before every timing (outside of the timed section)
+    so that functions that modify their input in place are timed on the same work.
+    Calls that are too fast to time on their own are timed in batches that take at least MIN_TIMED_SECONDS,
+    like timeit's autorange. The calls of a batch share one input.
+    Once a single call takes longer than max_call_seconds the size is not timed again.
+
+    Returns a list with the wall time in seconds of a single call for each of the timed repeats
+    """
+    for _ in range(warmup):
+        call_seconds = _time_calls(function, input_generator(size), 1)
+        if call_seconds > max_call_seconds:
+            return [call_seconds]
+
+    # Double the batch until it is long enough to time (which also warms the function up further)
+    calls_per_timing = 1
+    while True:
+        batch_seconds = _time_calls(function, input_generator(size), calls_per_timing)
+        if calls_per_timing == 1 and batch_seconds > max_call_seconds:
+            return [batch_seconds]
+        if batch_seconds >= MIN_TIMED_SECONDS:
+            break
+        calls_per_timing *= 2
+
+    timings = []
+    for _ in range(repeats):
+        timings.append(_time_calls(function, input_generator(size), calls_per_timing) / calls_per_timing)
+        if timings[-1] > max_call_seconds:
+            break
+
+    return timings
+
+
+def _log_log_slope(sizes: list[int], values: list[float]) -> float:
+    """Returns the least squares slope of log(values) against log(sizes)"""
+    log_sizes = [math.log(size) for size in sizes]
+    log_values = [math.log(max(value, 1e-12)) for value in values]
+    mean_log_size = sum(log_sizes) / len(log_sizes)
+    mean_log_value = sum(log_values) / len(log_values)
+
+    covariance = sum(
+        (log_size - mean_log_size) * (log_value - mean_log_value)
+        for log_size, log_value in zip(log_sizes, log_values)
+    )
+    variance = sum((log_size - mean_log_size) ** 2 for log_size in log_sizes)
+
+    return covariance / variance
+
+
+def validate_complexity_class(complexity: str):
+    """Raises ValueError if the complexity is not one of the COMPLEXITY_CLASSES"""
+    if complexity not in COMPLEXITY_CLASSES:
+        raise ValueError(f"Unknown complexity class {complexity}, expected one of {list(COMPLEXITY_CLASSES)}")
+
+
+def complexity_class_order(complexity: str, sizes: list[int]) -> float:
+    """Returns the order of growth of a complexity class over the given input sizes (e.g. 1 for O(n))"""
+    return _log_log_slope(sizes, [COMPLEXITY_CLASSES[complexity](size) for size in sizes])
+
+
+def fit_complexity(sizes: list[int], timings: list[float]) -> tuple[str, float]:
+    """
+    Fits the timings to the closest of the COMPLEXITY_CLASSES
+
+    The empirical order of growth is the slope of the timings on a log-log scale
+    (e.g. ~1 for O(n), ~2 for O(n^2)). It is compared to the slope of each complexity
+    class over the same input sizes.
+
+    Returns the name of the best fitting complexity class and the empirical order of growth
+    """
+    if len(sizes) != len(timings) or len(set(sizes)) < MIN_FIT_SIZES:
+        raise ValueError(f"At least {MIN_FIT_SIZES} different input sizes are needed to fit a complexity class")
+
+    empirical_order = _log_log_slope(sizes, timings)
+
+    best_fit = min(
+        COMPLEXITY_CLASSES,
+        key=lambda name: abs(complexity_class_order(name, sizes) - empirical_order),
+    )
+
+    return best_fit, empirical_order
+
+
+def measure_complexity(
+    function: FunctionType | Callable,
+    input_generator: Callable[[int], tuple],
+    min_size: int = 1000,
+    growth_factor: int = 2,
+    number_of_sizes: int = 6,
+    repeats: int = 5,
+    warmup: int = 1,
+    max_call_seconds: float = MAX_CALL_SECONDS,
+    max_measure_seconds: float = MAX_MEASURE_SECONDS,
+) -> tuple[str, float, list[int]]:
+    """
+    Runs the function over a geometric series of input sizes and fits its growth curve.
+    The sizes stop growing once a call takes longer than max_call_seconds (after the first MIN_FIT_SIZES sizes),
+    so a slow function does not run for minutes on the largest sizes.
+
+    Raises ComplexityTimeoutError if the whole measurement takes longer than max_measure_seconds
+    (only enforced in the main thread of platforms that support SIGALRM)
+
+    Returns the name of the best fitting complexity class, the empirical order of growth and the measured sizes
+    """
+    can_time_out = hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    sizes = []
+    median_timings = []
+    with alarm_timeout(max_measure_seconds, ComplexityTimeoutError) if can_time_out else nullcontext():
+        for size in generate_input_sizes(min_size, growth_factor, number_of_sizes):
+            sizes.append(size)
+            timings = time_function_call(function, input_generator, size, repeats, warmup, max_call_seconds)
+            median_timings.append(median(timings))
+            if median_timings[-1] > max_call_seconds and len(sizes) >= MIN_FIT_SIZES:
+                break
+
+    best_fit, empirical_order = fit_complexity(sizes, median_timings)
+
+    return best_fit, empirical_order, sizes
+
+
+def is_within_complexity(
+    empirical_order: float,
+    expected_complexity: str,
+    sizes: list[int],
+    tolerance: float = COMPLEXITY_ORDER_TOLERANCE,
+) -> bool:
+    """
+    Checks if the empirical order of growth exceeds the order of the expected complexity class
+    over the same input sizes by no more than the tolerance
+    """
+    validate_complexity_class(expected_complexity)
+
+    return empirical_order <= complexity_class_order(expected_complexity, sizes) + tolerance
+
+
+def reject_outliers(timings: list[float]) -> list[float]:
+    """
+    Removes timings that are more than OUTLIER_MAD_THRESHOLD median absolute deviations
+    away from the median (e.g. a run that was interrupted by another process)
+    """
+    median_timing = median(timings)
+    median_absolute_deviation = median(abs(timing - median_timing) for timing in timings)
+    if median_absolute_deviation == 0:
+        return list(timings)
+
+    return [
+        timing
+        for timing in timings
+        if abs(timing - median_timing) <= OUTLIER_MAD_THRESHOLD * median_absolute_deviation
+    ]
+
+
+def compare_runtime(
+    function: FunctionType | Callable,
+    reference_function: FunctionType | Callable,
+    inputs: list[tuple],
+    repeats: int = 7,
+    warmup: int = 1,
+) -> tuple[float, float]:
+    """
+    Times the function and the reference function on the same inputs in the same process.
+
+    inputs is a list of tuples of positional arguments. Each call receives a deep copy of its
+    arguments, and the two functions are run interleaved so that both are equally affected
+    by the load on the machine.
+
+    Returns the mean wall time in seconds (after rejecting outliers) of running all
+    the inputs for the function and for the reference function
+    """
+    for _ in range(warmup):
+        for arguments in inputs:
+            reference_function(*copy.deepcopy(arguments))
+            function(*copy.deepcopy(arguments))
+
+    function_timings = []
+    reference_timings = []
+    for _ in range(repeats):
+        function_total = reference_total = 0.0
+        for arguments in inputs:
+            reference_arguments = copy.deepcopy(arguments)
+            start = time.perf_counter()
+            reference_function(*reference_arguments)
+            reference_total += time.perf_counter() - start
+
+            function_arguments = copy.deepcopy(arguments)
+            start = time.perf_counter()
+            function(*function_arguments)
+            function_total += time.perf_counter() - start
+
+        function_timings.append(function_total)
+        reference_timings.append(reference_total)
+
+    function_timings = reject_outliers(function_timings)
+    reference_timings = reject_outliers(reference_timings)
+
+    return sum(function_timings) / len(function_timings), sum(reference_timings) / len(reference_timings)
+
+
+def measure_peak_memory(function: FunctionType | Callable, inputs: list[tuple]) -> int:
+    """
+    Returns the highest amount of bytes allocated by the function
+    during a single call over all the inputs, using tracemalloc
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+
+    highest_peak = 0
+    try:
+        for arguments in inputs:
+            arguments = copy.deepcopy(arguments)
+            tracemalloc.reset_peak()
+            memory_before_call, _ = tracemalloc.get_traced_memory()
+            function(*arguments)
+            _, peak_memory = tracemalloc.get_traced_memory()
+            highest_peak = max(highest_peak, peak_memory - memory_before_call)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    return highest_peak
+
+
+def compare_peak_memory(
+    function: FunctionType | Callable,
+    reference_function: FunctionType | Callable,
+    inputs: list[tuple],
+) -> tuple[int, int]:
+    """
+    Returns the peak allocations in bytes of the function and the reference function on the same inputs
+    """
+    return (
+        max(measure_peak_memory(function, inputs), MIN_PEAK_MEMORY_BYTES),
+        max(measure_peak_memory(reference_function, inputs), MIN_PEAK_MEMORY_BYTES),
+    )
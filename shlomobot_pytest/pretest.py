@@ -1,27 +1,40 @@
 """This module contains test functions that are primarily needed for all test files"""
-import pytest
 
 from functools import partial
 from types import FunctionType
 
-from shlomobot_pytest.utils import create_custom_error_json
+from shlomobot_pytest.utils import create_custom_error_json, error_limit_for_deduction, summarise_error_codes
 
 from shlomobot_pytest.common_tests import (
     find_missing_expected_files,
     find_missing_expected_functions,
-    pep8_conformance,
+    pep8_error_summary,
     contains_main_function,
     contains_name_eq_main_statement,
     is_main_function_last,
     find_functions_with_missing_docstrings,
 )
+from shlomobot_pytest.name_matching import suggest_file_names, suggest_function_names, describe_missing_names
+
+# Every pretest with the pretests that must pass before it runs, in the order they run
+PRETEST_DEPENDENCIES = {
+    "test_expected_files_exist": [],
+    "test_expected_functions_exist": ["test_expected_files_exist"],
+    "test_pep8_compliant": ["test_expected_functions_exist"],
+    "test_contains_main_function": ["test_expected_functions_exist"],
+    "test_name_eq_main_statement_exist": ["test_contains_main_function"],
+    "test_main_function_is_last_function": ["test_contains_main_function"],
+    "test_docstring_exists": ["test_expected_functions_exist"],
+}
 
 
 def pytest_decorate(name: str, depends: list[str], function: FunctionType):
     """
     This function is used to decorate the pretest with the pytest decorators
     """
-    
+    # Imported here so that the shlomobot-pretest command can run the pretests without importing pytest
+    import pytest
+
     @pytest.mark.dependency(
         name=name, depends=depends,
     )
@@ -78,13 +91,14 @@ def register_tests(
 
     When adding new pretests, things to do:
     1) Add the test name as one of the parameter in the register_tests function
-    2) Add a if condition inside the function to create a partial function
-    3) Add the new pretest function into the code and end the function name with '_pretest'
+    2) Add the test name and its dependencies to PRETEST_DEPENDENCIES
+    3) Add a if condition inside the function to create a partial function
+    4) Add the new pretest function into the code and end the function name with '_pretest'
     """
 
     if test_expected_files_exist is not None:
         pytest_name = "test_expected_files_exist"
-        pytest_depends = []
+        pytest_depends = PRETEST_DEPENDENCIES[pytest_name]
 
         module_scope['test_expected_files_exist'] = pytest_decorate(
             pytest_name, pytest_depends,
@@ -93,7 +107,7 @@ def register_tests(
 
     if test_expected_functions_exist is not None:
         pytest_name = "test_expected_functions_exist"
-        pytest_depends = ["test_expected_files_exist"]
+        pytest_depends = PRETEST_DEPENDENCIES[pytest_name]
 
         module_scope['test_expected_functions_exist'] = pytest_decorate(
             pytest_name, pytest_depends,
@@ -102,7 +116,7 @@ def register_tests(
 
     if test_pep8_compliant is not None:
         pytest_name = "test_pep8_compliant"
-        pytest_depends = ["test_expected_functions_exist"]
+        pytest_depends = PRETEST_DEPENDENCIES[pytest_name]
 
         module_scope['test_pep8_compliant'] = pytest_decorate(
             pytest_name, pytest_depends,
@@ -111,7 +125,7 @@ def register_tests(
 
     if test_contains_main_function is not None:
         pytest_name = "test_contains_main_function"
-        pytest_depends = ["test_expected_functions_exist"]
+        pytest_depends = PRETEST_DEPENDENCIES[pytest_name]
 
         module_scope['test_contains_main_function'] = pytest_decorate(
             pytest_name, pytest_depends,
@@ -120,7 +134,7 @@ def register_tests(
 
     if test_name_eq_main_statement_exist is not None:
         pytest_name = "test_name_eq_main_statement_exist"
-        pytest_depends = ["test_contains_main_function"]
+        pytest_depends = PRETEST_DEPENDENCIES[pytest_name]
 
         module_scope['test_name_eq_main_statement_exist'] = pytest_decorate(
             pytest_name, pytest_depends,
@@ -129,7 +143,7 @@ def register_tests(
 
     if test_main_function_is_last_function is not None:
         pytest_name = "test_main_function_is_last_function"
-        pytest_depends = ["test_contains_main_function"]
+        pytest_depends = PRETEST_DEPENDENCIES[pytest_name]
 
         module_scope['test_main_function_is_last_function'] = pytest_decorate(
             pytest_name, pytest_depends,
@@ -138,7 +152,7 @@ def register_tests(
 
     if test_docstring_exists is not None:
         pytest_name = "test_docstring_exists"
-        pytest_depends = ["test_expected_functions_exist"]
+        pytest_depends = PRETEST_DEPENDENCIES[pytest_name]
 
         module_scope['test_docstring_exists'] = pytest_decorate(
             pytest_name, pytest_depends,
@@ -152,10 +166,14 @@ def test_expected_files_exist_pretest(
     # Check user file names
 
     wrongly_named_files = find_missing_expected_files(file_function_map.keys())
+    suggestions = suggest_file_names(list(file_function_map.keys()), wrongly_named_files)
 
     from shlomobot_pytest.utils import create_custom_error_json
     custom_error_message = create_custom_error_json(
-        feedback=f"The name for the following submitted file(s) are wrong: {', '.join(wrongly_named_files)}",
+        feedback=(
+            "The name for the following submitted file(s) are wrong: "
+            f"{describe_missing_names(wrongly_named_files, suggestions)}"
+        ),
         points_per_error=100,
         max_points_deducted=100,
         number_of_errors=1,
@@ -170,10 +188,14 @@ def test_expected_functions_exist_pretest(
     # Checks user function names
 
     wrongly_named_functions = find_missing_expected_functions(file_function_map)
+    suggestions = suggest_function_names(file_function_map, wrongly_named_functions)
     from shlomobot_pytest.utils import create_custom_error_json
 
     custom_error_message = create_custom_error_json(
-        feedback=f"The name for the following function(s) are wrong: {', '.join(wrongly_named_functions)}",
+        feedback=(
+            "The name for the following function(s) are wrong: "
+            f"{describe_missing_names(wrongly_named_functions, suggestions)}"
+        ),
         points_per_error=100,
         max_points_deducted=100,
         number_of_errors=len(wrongly_named_functions),
@@ -185,26 +207,21 @@ def test_expected_functions_exist_pretest(
 def test_pep8_compliant_pretest(
     file_function_map: dict[str, list[str]]=dict(),
 ):
-    # Checks that pep8 is conformed to
-
-    pep8_errors = pep8_conformance(file_function_map.keys())
+    # Checks that pep8 is conformed to, counting errors only until the maximum deduction is reached
 
-    combined_errors_string_list = []
-    total_num_of_errors = 0
-    for filename, error_messages_list in pep8_errors.items():
-        individual_file_errors_string = f"{filename} - {', '.join(error_messages_list)}"
-        combined_errors_string_list.append(individual_file_errors_string)
-        total_num_of_errors += len(error_messages_list)
-    from shlomobot_pytest.utils import create_custom_error_json
+    points_per_error = 5
+    max_points_deducted = 30
+    error_limit = error_limit_for_deduction(points_per_error, max_points_deducted)
+    total_num_of_errors, code_counts, examples = pep8_error_summary(file_function_map.keys(), error_limit)
 
     custom_error_message = create_custom_error_json(
-        feedback=f"{'; '.join(combined_errors_string_list)}",
-        points_per_error=5,
-        max_points_deducted=30,
+        feedback=summarise_error_codes(total_num_of_errors, code_counts, examples, error_limit),
+        points_per_error=points_per_error,
+        max_points_deducted=max_points_deducted,
         number_of_errors=total_num_of_errors,
     )
 
-    assert pep8_errors == {}, custom_error_message
+    assert total_num_of_errors == 0, custom_error_message
 
 
 def test_contains_main_function_pretest(
@@ -284,6 +301,7 @@ def test_docstring_exists_pretest(
         number_of_errors=number_of_errors,
     )
 
-    functions_with_missing_docstring = find_functions_with_missing_docstrings(file_function_map.keys())
+    # A single missing docstring is enough to fail the test
+    functions_with_missing_docstring = find_functions_with_missing_docstrings(file_function_map.keys(), max_errors=1)
 
     assert len(functions_with_missing_docstring) == 0, custom_error_message
@@ -0,0 +1,263 @@
+"""
+This module contains functions to detect near-duplicate functions across submissions
+using MinHash signatures and a locality sensitive hashing (LSH) index
+"""
+
+# ================= IMPORTS =================
+
+import io
+import json
+import keyword
+import builtins
+import hashlib
+import random
+import tokenize
+from collections import defaultdict
+from itertools import combinations
+from types import FunctionType
+from shlomobot_pytest.utils import get_clean_function_lines
+
+# ================= CONSTANTS =================
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+NUM_BANDS = 32
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+IDENTIFIER_TOKEN = "ID"
+STRING_TOKEN = "STR"
+NUMBER_TOKEN = "NUM"
+BUILTIN_NAMES = set(dir(builtins))
+SKIPPED_TOKEN_TYPES = {
+    tokenize.COMMENT,
+    tokenize.NL,
+    tokenize.NEWLINE,
+    tokenize.ENCODING,
+    tokenize.ENDMARKER,
+}
+
+
+def normalise_function_tokens(function: FunctionType) -> list[str]:
+    """
+    Returns the token stream of a function without comments and docstrings,
+    where identifiers, strings and numbers are replaced with placeholders.
+    Keywords, builtins and attribute names (e.g. `.append`) are kept as is.
+
+    e.g. `total = total + len(values)` becomes ["ID", "=", "ID", "+", "len", "(", "ID", ")"]
+    """
+    function_code = "\n".join(get_clean_function_lines(function)) + "\n"
+
+    tokens = []
+    previous_token = ""
+    for token in tokenize.generate_tokens(io.StringIO(function_code).readline):
+        if token.type in SKIPPED_TOKEN_TYPES:
+            continue
+        if token.type == tokenize.NAME:
+            if keyword.iskeyword(token.string) or token.string in BUILTIN_NAMES or previous_token == ".":
+                normalised_token = token.string
+            else:
+                normalised_token = IDENTIFIER_TOKEN
+        elif token.type == tokenize.STRING:
+            normalised_token = STRING_TOKEN
+        elif token.type == tokenize.NUMBER:
+            normalised_token = NUMBER_TOKEN
+        elif token.type == tokenize.INDENT:
+            normalised_token = "INDENT"
+        elif token.type == tokenize.DEDENT:
+            normalised_token = "DEDENT"
+        else:
+            normalised_token = token.string
+        tokens.append(normalised_token)
+        previous_token = token.string
+
+    return tokens
+
+
+def shingle_tokens(tokens: list[str], shingle_size: int = SHINGLE_SIZE) -> set[int]:
+    """
+    Returns the set of hashed shingles (runs of shingle_size consecutive tokens) of a token stream
+    """
+    if len(tokens) < shingle_size:
+        shingle_size = len(tokens)
+
+    shingles = set()
+    for index in range(len(tokens) - shingle_size + 1):
+        shingle = " ".join(tokens[index: index + shingle_size]).encode()
+        shingles.add(int.from_bytes(hashlib.blake2b(shingle, digest_size=4).digest(), "big"))
+
+    return shingles
+
+
+def generate_permutations(num_permutations: int = NUM_PERMUTATIONS, seed: int = 1) -> list[tuple[int, int]]:
+    """Returns the (a, b) parameters of the hash functions h(x) = (a * x + b) % MERSENNE_PRIME"""
+    permutations_random = random.Random(seed)
+
+    return [
+        (permutations_random.randrange(1, MERSENNE_PRIME), permutations_random.randrange(0, MERSENNE_PRIME))
+        for _ in range(num_permutations)
+    ]
+
+
+def compute_minhash(shingles: set[int], permutations: list[tuple[int, int]]) -> list[int]:
+    """Returns the MinHash signature of a set of hashed shingles"""
+    if not shingles:
+        return [MAX_HASH] * len(permutations)
+
+    return [min(((a * shingle + b) % MERSENNE_PRIME) & MAX_HASH for shingle in shingles) for a, b in permutations]
+
+
+def estimate_similarity(signature: list[int], other_signature: list[int]) -> float:
+    """Estimates the Jaccard similarity of two sets from their MinHash signatures"""
+    equal_values = sum(value == other_value for value, other_value in zip(signature, other_signature))
+
+    return equal_values / len(signature)
+
+
+class LSHIndex:
+    """
+    Stores MinHash signatures in bands, so that only signatures that share at least one band
+    are compared with each other. Signatures can be added incrementally and the index can be
+    saved to and loaded from a json file.
+
+    Keys identify a function, e.g. "2023/trainee_1/sample_test.py::main"
+    """
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, num_bands: int = NUM_BANDS, seed: int = 1):
+        if num_permutations % num_bands != 0:
+            raise ValueError("num_permutations must be divisible by num_bands")
+
+        self.num_permutations = num_permutations
+        self.num_bands = num_bands
+        self.seed = seed
+        self.rows_per_band = num_permutations // num_bands
+        self.permutations = generate_permutations(num_permutations, seed)
+        self.signatures: dict[str, list[int]] = {}
+        # Identical signatures (e.g. of an untouched template function) are stored once, with all their keys
+        self.signature_keys: dict[tuple[int, ...], list[str]] = {}
+        self.buckets: list[dict[int, list[tuple[int, ...]]]] = [defaultdict(list) for _ in range(num_bands)]
+
+    def _band_hashes(self, signature: list[int]) -> list[int]:
+        """Returns the hash of each band of a signature"""
+        return [
+            hash(tuple(signature[band * self.rows_per_band: (band + 1) * self.rows_per_band]))
+            for band in range(self.num_bands)
+        ]
+
+    def signature_of(self, function: FunctionType) -> list[int]:
+        """Returns the MinHash signature of a function"""
+        return compute_minhash(shingle_tokens(normalise_function_tokens(function)), self.permutations)
+
+    def add(self, key: str, signature: list[int]):
+        """Adds a signature to the index under the given key"""
+        if key in self.signatures:
+            raise ValueError(f"{key} is already in the index")
+
+        self.signatures[key] = signature
+        signature_tuple = tuple(signature)
+        if signature_tuple in self.signature_keys:
+            self.signature_keys[signature_tuple].append(key)
+            return
+
+        self.signature_keys[signature_tuple] = [key]
+        for band_bucket, band_hash in zip(self.buckets, self._band_hashes(signature)):
+            band_bucket[band_hash].append(signature_tuple)
+
+    def add_function(self, key: str, function: FunctionType):
+        """Adds a function to the index under the given key"""
+        self.add(key, self.signature_of(function))
+
+    def _similar_signatures(self, signature: list[int], threshold: float) -> list[tuple[tuple[int, ...], float]]:
+        """Returns the distinct signatures in the index that share a band with the signature and are similar enough"""
+        candidate_signatures = set()
+        for band_bucket, band_hash in zip(self.buckets, self._band_hashes(signature)):
+            candidate_signatures.update(band_bucket.get(band_hash, ()))
+
+        similar_signatures = []
+        for candidate_signature in candidate_signatures:
+            similarity = estimate_similarity(signature, candidate_signature)
+            if similarity >= threshold:
+                similar_signatures.append((candidate_signature, similarity))
+
+        return similar_signatures
+
+    def query(self, signature: list[int], threshold: float = 0.8) -> list[tuple[str, float]]:
+        """
+        Returns the keys in the index whose estimated similarity to the signature is at least threshold,
+        as (key, similarity) pairs sorted from the most similar
+        """
+        similar_keys = [
+            (key, similarity)
+            for similar_signature, similarity in self._similar_signatures(signature, threshold)
+            for key in self.signature_keys[similar_signature]
+        ]
+
+        return sorted(similar_keys, key=lambda pair: (-pair[1], pair[0]))
+
+    def candidate_pairs(self, threshold: float = 0.8, keys: list[str] = None) -> list[tuple[str, str, float]]:
+        """
+        Returns pairs of keys whose estimated similarity is at least threshold,
+        as (key, other key, similarity) sorted from the most similar.
+
+        When keys is given (e.g. the functions of a new cohort), only pairs that
+        contain at least one of those keys are returned, by querying the index for each of them
+        """
+        pairs = {}
+
+        def add_pair(key: str, other_key: str, similarity: float):
+            pairs[(key, other_key) if key < other_key else (other_key, key)] = similarity
+
+        if keys is not None:
+            for key in keys:
+                for other_key, similarity in self.query(self.signatures[key], threshold):
+                    if other_key != key:
+                        add_pair(key, other_key, similarity)
+        else:
+            # Compare every two distinct signatures that share a band once, however many bands they share
+            compared_signatures = set()
+            for band_bucket in self.buckets:
+                for bucket_signatures in band_bucket.values():
+                    for signature, other_signature in combinations(bucket_signatures, 2):
+                        signature_pair = frozenset((signature, other_signature))
+                        if signature_pair in compared_signatures:
+                            continue
+                        compared_signatures.add(signature_pair)
+                        similarity = estimate_similarity(signature, other_signature)
+                        if similarity >= threshold:
+                            for key in self.signature_keys[signature]:
+                                for other_key in self.signature_keys[other_signature]:
+                                    add_pair(key, other_key, similarity)
+            # Keys with identical signatures are fully similar to each other
+            if threshold <= 1.0:
+                for signature_keys in self.signature_keys.values():
+                    for key, other_key in combinations(signature_keys, 2):
+                        add_pair(key, other_key, 1.0)
+
+        return sorted(
+            [(key, other_key, similarity) for (key, other_key), similarity in pairs.items()],
+            key=lambda pair: (-pair[2], pair[0], pair[1]),
+        )
+
+    def save(self, path: str):
+        """Saves the index to a json file"""
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "num_permutations": self.num_permutations,
+                    "num_bands": self.num_bands,
+                    "seed": self.seed,
+                    "signatures": self.signatures,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "LSHIndex":
+        """Loads an index that was saved with save()"""
+        with open(path, "r") as f:
+            saved_index = json.load(f)
+
+        index = cls(saved_index["num_permutations"], saved_index["num_bands"], saved_index["seed"])
+        for key, signature in saved_index["signatures"].items():
+            index.add(key, signature)
+
+        return index
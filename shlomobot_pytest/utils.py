@@ -2,13 +2,18 @@
 
 import re
 import sys
-import pytest
+import time
 import inspect
 import dis
-from io import StringIO
+import signal
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO, TextIOBase
 from typing import Iterator
 from importlib import import_module
-from black import format_str, FileMode
 from types import ModuleType, FunctionType
 
 # ================= CONSTANTS =================
@@ -19,30 +24,258 @@ CLOSE_DOCSTRING_REGEX = re.compile(r'.*?([\'"]{3})$')
 COMMENT_REGEX = re.compile(r"^\t*\s*#")
 DEFINE_REGEX = re.compile(r"^\s*def ")
 TEMP_FILENAME = "studentfile_temp.py"
+MAX_OUTPUT_CHARS = 100_000
+CONCURRENT_IO_WORKERS = 8
+# Seconds a regular expression may spend searching a single line before the check is inconclusive
+REGEX_TIME_BUDGET = 1.0
+REGEX_MATCH = "match"
+REGEX_NO_MATCH = "no match"
+CHECK_INCONCLUSIVE = "inconclusive"
+
+# Streams of the program that runs in the current context (thread), None outside of run_python_io
+_context_stdin: ContextVar[TextIOBase | None] = ContextVar("context_stdin", default=None)
+_context_stdout: ContextVar[TextIOBase | None] = ContextVar("context_stdout", default=None)
+_routed_stdio_lock = threading.Lock()
+_routed_stdio_users = 0
+# Names that are only imported once they are used, so that importing utils does not import pytest or black,
+# mapped to their (module, attribute). The fixtures are defined in shlomobot_pytest.fixtures
+LAZY_ATTRIBUTES = {
+    "simulate_python_io": ("shlomobot_pytest.fixtures", "simulate_python_io"),
+    "simulate_python_io_compare": ("shlomobot_pytest.fixtures", "simulate_python_io_compare"),
+    "pytest": ("pytest", None),
+    "format_str": ("black", "format_str"),
+    "FileMode": ("black", "FileMode"),
+}
+
+
+def __getattr__(name: str):
+    """Imports the lazy attributes once they are used, e.g. `from shlomobot_pytest.utils import simulate_python_io`"""
+    if name in LAZY_ATTRIBUTES:
+        module_name, attribute = LAZY_ATTRIBUTES[name]
+        module = import_module(module_name)
+
+        return module if attribute is None else getattr(module, attribute)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class OutputStopped(BaseException):
+    """
+    Raised from print() to stop the trainee's program once its output is known to be wrong.
+    Inherits from BaseException so that it is not caught by `except Exception` in the trainee's code
+    """
+
 
+class StreamingOutputComparer(TextIOBase):
+    """
+    A stdout replacement that compares the output line by line against the expected output as it is written.
+
+    Only the current unfinished line is kept in memory. Writing stops the program (by raising OutputStopped)
+    as soon as a line differs from the expected output or the output exceeds max_output_chars.
+    """
 
-@pytest.fixture()
-def simulate_python_io(monkeypatch, capsys: pytest.CaptureFixture):
+    def __init__(
+        self,
+        expected_output: str,
+        max_output_chars: int = MAX_OUTPUT_CHARS,
+        ignore_case: bool = False,
+        normalise_whitespace: bool = False,
+        ignore_trailing_newlines: bool = True,
+    ):
+        self.max_output_chars = max_output_chars
+        self.ignore_case = ignore_case
+        self.normalise_whitespace = normalise_whitespace
+        self.ignore_trailing_newlines = ignore_trailing_newlines
+
+        self.expected_lines = expected_output.split("\n")
+        if ignore_trailing_newlines:
+            while self.expected_lines and not self.normalise_line(self.expected_lines[-1]):
+                self.expected_lines.pop()
+
+        self.output_chars = 0
+        self.current_line = ""
+        self.line_index = 0
+        # Blank lines are only compared once a non blank line follows them, since they may be trailing newlines
+        self.pending_blank_lines = 0
+        self.feedback = ""
+
+    def writable(self) -> bool:
+        return True
+
+    def normalise_line(self, line: str) -> str:
+        """Normalises a single line of output according to the comparison options"""
+        line = " ".join(line.split()) if self.normalise_whitespace else line.rstrip("\r")
+        return line.lower() if self.ignore_case else line
+
+    def _stop(self, feedback: str):
+        self.feedback = feedback
+        raise OutputStopped(feedback)
+
+    def _compare_line(self, line: str):
+        if self.line_index >= len(self.expected_lines):
+            self._stop(f"Line {self.line_index + 1}: expected no more output but got {line!r}")
+
+        expected_line = self.expected_lines[self.line_index]
+        if self.normalise_line(line) != self.normalise_line(expected_line):
+            self._stop(f"Line {self.line_index + 1}: expected {expected_line!r} but got {line!r}")
+        self.line_index += 1
+
+    def _add_line(self, line: str):
+        if self.ignore_trailing_newlines and not self.normalise_line(line):
+            self.pending_blank_lines += 1
+            return
+
+        for _ in range(self.pending_blank_lines):
+            self._compare_line("")
+        self.pending_blank_lines = 0
+        self._compare_line(line)
+
+    def write(self, text: str) -> int:
+        if self.feedback:
+            raise OutputStopped(self.feedback)
+
+        self.output_chars += len(text)
+        if self.output_chars > self.max_output_chars:
+            self._stop(f"The output is longer than the limit of {self.max_output_chars} characters")
+
+        *finished_lines, self.current_line = (self.current_line + text).split("\n")
+        for line in finished_lines:
+            self._add_line(line)
+
+        return len(text)
+
+    def finish(self) -> str:
+        """
+        Compares the remaining output once the program has finished.
+        Returns the feedback for the first differing line, or an empty string if the output matches
+        """
+        if self.feedback:
+            return self.feedback
+
+        try:
+            # The output is split into lines like the expected output, so output that ends with a newline
+            # ends with an empty line (which is only compared when trailing newlines are not ignored)
+            self._add_line(self.current_line)
+            self.current_line = ""
+            if self.line_index < len(self.expected_lines):
+                self._stop(
+                    f"Line {self.line_index + 1}: expected {self.expected_lines[self.line_index]!r} but the output ended"
+                )
+        except OutputStopped:
+            pass
+
+        return self.feedback
+
+
+class ContextRoutedStream(TextIOBase):
     """
-    A fixture to simulate input-output of a python file.
-    This should be called with the python filename parameter, and than the input(s) as *args.
-    Each given argument is equivalent to 1 line of input (splitted by \\n)
+    Replaces sys.stdin / sys.stdout and forwards every call to the stream of the current context,
+    or to the original stream when the current context has none.
+    This lets programs that run on different threads each use their own stdin and stdout.
     """
 
-    def wrapper(*args, pyfile):
-        send_input_string = ""
+    def __init__(self, context_stream: ContextVar, original_stream: TextIOBase):
+        self.context_stream = context_stream
+        self.original_stream = original_stream
+
+    def _target(self) -> TextIOBase:
+        return self.context_stream.get() or self.original_stream
+
+    def readable(self) -> bool:
+        return self._target().readable()
+
+    def writable(self) -> bool:
+        return self._target().writable()
+
+    def read(self, size: int = -1) -> str:
+        return self._target().read(size)
+
+    def readline(self, size: int = -1) -> str:
+        return self._target().readline(size)
 
-        # Converting args to list, to maintain the order of the recived inputs.
-        for item in args:
-            send_input_string += str(item) + "\n"
-        monkeypatch.setattr(sys, "stdin", StringIO(send_input_string))
+    def write(self, text: str) -> int:
+        return self._target().write(text)
 
-        with open(pyfile, "r") as f:
-            exec(f.read())
-        user_output = capsys.readouterr().out
-        return user_output
+    def flush(self):
+        return self._target().flush()
 
-    return wrapper
+    def __getattr__(self, name: str):
+        return getattr(self._target(), name)
+
+
+@contextmanager
+def context_routed_stdio():
+    """
+    Installs ContextRoutedStream as sys.stdin and sys.stdout for as long as any caller is inside this context
+    """
+    global _routed_stdio_users
+
+    with _routed_stdio_lock:
+        if _routed_stdio_users == 0:
+            sys.stdin = ContextRoutedStream(_context_stdin, sys.stdin)
+            sys.stdout = ContextRoutedStream(_context_stdout, sys.stdout)
+        _routed_stdio_users += 1
+
+    try:
+        yield
+    finally:
+        with _routed_stdio_lock:
+            _routed_stdio_users -= 1
+            if _routed_stdio_users == 0:
+                sys.stdin = sys.stdin.original_stream
+                sys.stdout = sys.stdout.original_stream
+
+
+def run_python_io(pyfile: str, *args, output: TextIOBase = None) -> str:
+    """
+    Runs a python file with its own stdin and stdout, which are only seen by the current thread.
+    Each given argument is equivalent to 1 line of input.
+
+    output can be used to pass a custom stdout (e.g. a StreamingOutputComparer).
+    Returns everything the program printed (an empty string when output is given)
+    """
+    send_input_string = "".join(str(item) + "\n" for item in args)
+    program_output = StringIO() if output is None else output
+
+    with open(pyfile, "r") as f:
+        code = compile(f.read(), pyfile, "exec")
+
+    with context_routed_stdio():
+        stdin_token = _context_stdin.set(StringIO(send_input_string))
+        stdout_token = _context_stdout.set(program_output)
+        try:
+            exec(code, {"__name__": "__main__"})
+        except (OutputStopped, SystemExit):
+            pass
+        finally:
+            _context_stdin.reset(stdin_token)
+            _context_stdout.reset(stdout_token)
+
+    return program_output.getvalue() if output is None else ""
+
+
+def run_python_io_concurrently(
+    cases: list[tuple[str, list]], max_workers: int = CONCURRENT_IO_WORKERS
+) -> list[str | BaseException]:
+    """
+    Runs many input-output cases concurrently on threads in the current process.
+    Each case is a (python filename, list of input lines) pair and gets its own isolated stdin and stdout.
+
+    Returns the output of each case in the order of the cases, or the exception
+    the case raised (e.g. EOFError when the program asked for more input than was given).
+    There is no timeout per case, so this should only be used for short programs.
+    """
+
+    def run_case(case: tuple[str, list]) -> str | BaseException:
+        pyfile, inputs = case
+        try:
+            return run_python_io(pyfile, *inputs)
+        except Exception as error:
+            return error
+
+    with context_routed_stdio():
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run_case, cases))
 
 
 def convert_pyfile_to_function_type(py_filename: str):
@@ -112,6 +345,11 @@ def create_custom_error_json(
         number_of_errors,
     )
 
+    return format_custom_error_json(feedback, total_points_deducted)
+
+
+def format_custom_error_json(feedback: str, total_points_deducted: int) -> str:
+    """Creates a custom error message for the test files from points that were already calculated"""
     return f'{{"feedback": "{feedback}", "points_deducted": {total_points_deducted}}} EndMarker'
 
 
@@ -124,6 +362,32 @@ def calculate_total_deducted_score(
     return min(total_points_deducted, max_points_deducted)
 
 
+def error_limit_for_deduction(points_per_error: int, max_points_deducted: int) -> int | None:
+    """
+    Returns the number of errors after which the points deducted reach max_points_deducted,
+    so that collectors can stop counting errors that no longer change the score
+    """
+    if points_per_error <= 0:
+        return None
+
+    return max(-(-max_points_deducted // points_per_error), 1)
+
+
+def summarise_error_codes(
+    number_of_errors: int, code_counts: dict[str, int], examples: list[str], error_limit: int = None
+) -> str:
+    """
+    Creates a short feedback with the number of errors per code and a few example errors
+
+    e.g. "At least 6 errors (W191 x 5, E201 x 1), for example: sample_test.py - Row 3: Col 0: W191 indentation contains tabs"
+    """
+    sorted_code_counts = sorted(code_counts.items(), key=lambda item: -item[1])
+    counts_string = ", ".join(f"{code} x {count}" for code, count in sorted_code_counts)
+    errors_string = f"At least {number_of_errors}" if number_of_errors == error_limit else f"{number_of_errors}"
+
+    return f"{errors_string} errors ({counts_string}), for example: {'; '.join(examples)}"
+
+
 def import_pyfile(py_filename: str) -> ModuleType:
     """Extracts the module from a given filename"""
     stripped_module_name = py_filename.removesuffix(".py")
@@ -146,8 +410,10 @@ def get_clean_function_lines(function: FunctionType, should_black=True) -> list[
     """Count the amount on non comment or docstring lines in a function code"""
     function_code = inspect.getsource(function)
 
-    # Reformats file to connect split lines using black
+    # Reformats file to connect split lines using black (imported here since it is slow to import)
     if should_black:
+        from black import format_str, FileMode
+
         function_code = format_str(function_code, mode=FileMode(line_length=99999))
 
     # Using filter to remove empty lines from the list of lines
@@ -182,16 +448,167 @@ def get_clean_function_lines(function: FunctionType, should_black=True) -> list[
     return clean_lines
 
 
+class RegexTimeoutError(Exception):
+    """Raised when a regular expression takes longer than its time budget to search a line"""
+
+    def __init__(self, pattern: str, line_index: int, time_budget: float):
+        self.pattern = pattern
+        self.line_index = line_index
+        self.time_budget = time_budget
+        super().__init__(f"Searching for {pattern!r} on line {line_index + 1} took longer than {time_budget} seconds")
+
+
+class InconclusiveCheckError(Exception):
+    """
+    Raised when a check cannot decide whether the trainee's code passes it,
+    e.g. because a regular expression ran out of its time budget
+    """
+
+
+@contextmanager
+def alarm_timeout(seconds: float, timeout_error: type[BaseException] = TimeoutError):
+    """
+    Raises timeout_error inside the block once it ran for the given seconds, using SIGALRM (main thread only).
+
+    An enclosing timer (e.g. pytest-timeout) keeps running: it is restored with its remaining time afterwards,
+    and when it is due before the block's timeout the block is interrupted then so the enclosing timer fires on time
+    """
+
+    def raise_timeout(signum, frame):
+        raise timeout_error()
+
+    outer_delay, outer_interval = signal.getitimer(signal.ITIMER_REAL)
+    start_time = time.monotonic()
+    previous_handler = signal.signal(signal.SIGALRM, raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, min(seconds, outer_delay) if outer_delay else seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+        if outer_delay:
+            # A zero delay would disarm the timer, so an enclosing timer that is already due fires right away
+            remaining_delay = max(outer_delay - (time.monotonic() - start_time), 1e-6)
+            signal.setitimer(signal.ITIMER_REAL, remaining_delay, outer_interval)
+
+
+def _search_lines_with_alarm(
+    regexes: list[re.Pattern], lines: list[str], time_budget: float, find_all: bool
+) -> list[list[int]]:
+    """Searches the lines in the main thread, interrupting each search with SIGALRM after time_budget seconds"""
+    matching_line_indexes = [[] for _ in regexes]
+    for regex, regex_matching_line_indexes in zip(regexes, matching_line_indexes):
+        for line_index, line in enumerate(lines):
+            try:
+                with alarm_timeout(time_budget):
+                    is_match = regex.search(line) is not None
+            except TimeoutError:
+                raise RegexTimeoutError(regex.pattern, line_index, time_budget)
+
+            if is_match:
+                regex_matching_line_indexes.append(line_index)
+                if not find_all:
+                    break
+
+    return matching_line_indexes
+
+
+def _search_lines_in_child(
+    connection, regexes: list[re.Pattern], lines: list[str], time_budget: float, find_all: bool
+):
+    """Runs _search_lines_with_alarm in a child process and sends back the result or the timed out pattern and line"""
+    try:
+        connection.send(_search_lines_with_alarm(regexes, lines, time_budget, find_all))
+    except RegexTimeoutError as error:
+        connection.send((error.pattern, error.line_index))
+    finally:
+        connection.close()
+
+
+def search_patterns_within_budget(
+    regexes: list[str | re.Pattern],
+    lines: list[str],
+    time_budget: float = REGEX_TIME_BUDGET,
+    find_all: bool = True,
+) -> list[list[int]]:
+    """
+    Returns the indexes of the lines that each regular expression matches
+    (only the first one of each when find_all is False).
+
+    Every line may be searched for at most time_budget seconds, so a pattern that backtracks
+    catastrophically on a long line raises RegexTimeoutError instead of stalling the grader.
+    In the main thread the search is interrupted with SIGALRM, in other threads all the patterns
+    are searched in a single child process.
+    """
+    regexes = [regex if isinstance(regex, re.Pattern) else re.compile(regex) for regex in regexes]
+
+    if not hasattr(signal, "setitimer"):
+        # No way to interrupt a search on this platform
+        matching_line_indexes = [[index for index, line in enumerate(lines) if regex.search(line)] for regex in regexes]
+        return matching_line_indexes if find_all else [indexes[:1] for indexes in matching_line_indexes]
+
+    if threading.current_thread() is threading.main_thread():
+        return _search_lines_with_alarm(regexes, lines, time_budget, find_all)
+
+    parent_connection, child_connection = multiprocessing.Pipe(duplex=False)
+    child = multiprocessing.get_context("fork").Process(
+        target=_search_lines_in_child, args=(child_connection, regexes, lines, time_budget, find_all)
+    )
+    child.start()
+    child_connection.close()
+    # Every line can take up to time_budget per pattern, the extra second covers starting the child
+    has_result = parent_connection.poll(time_budget * len(lines) * len(regexes) + 1)
+    result = parent_connection.recv() if has_result else None
+    child.join(0.1)
+    if child.is_alive():
+        child.kill()
+        child.join()
+
+    if isinstance(result, list):
+        return result
+    pattern, line_index = result if result is not None else (regexes[0].pattern, 0)
+    raise RegexTimeoutError(pattern, line_index, time_budget)
+
+
+def search_lines_within_budget(
+    regex: str | re.Pattern,
+    lines: list[str],
+    time_budget: float = REGEX_TIME_BUDGET,
+    find_all: bool = True,
+) -> list[int]:
+    """
+    Returns the indexes of the lines that the regular expression matches (only the first one when find_all is False),
+    searching every line for at most time_budget seconds like search_patterns_within_budget
+    """
+    return search_patterns_within_budget([regex], lines, time_budget, find_all)[0]
+
+
+def function_regex_verdict(
+    regex: str | re.Pattern, function: FunctionType, time_budget: float = REGEX_TIME_BUDGET
+) -> str:
+    """
+    Checks if the function contains a specific regular expression, within a time budget per line.
+    Returns REGEX_MATCH, REGEX_NO_MATCH or CHECK_INCONCLUSIVE when the time budget ran out
+    """
+    try:
+        if search_lines_within_budget(regex, get_clean_function_lines(function), time_budget, find_all=False):
+            return REGEX_MATCH
+        return REGEX_NO_MATCH
+    except RegexTimeoutError:
+        return CHECK_INCONCLUSIVE
+
+
 def function_contains_regex(regex: str | re.Pattern, function: FunctionType) -> bool:
-    """Checks if the function contains a specific regular expression"""
-    if isinstance(regex, re.Pattern):
-        regex = re.compile(regex)
+    """
+    Checks if the function contains a specific regular expression
 
-    for line in get_clean_function_lines(function):
-        if re.search(regex, line):
-            return True
+    Raises InconclusiveCheckError if the regular expression ran out of its time budget
+    """
+    verdict = function_regex_verdict(regex, function)
+    if verdict == CHECK_INCONCLUSIVE:
+        raise InconclusiveCheckError(f"Could not check {function.__name__} for {regex!r} within the time budget")
 
-    return False
+    return verdict == REGEX_MATCH
 
 
 def get_function_regex_matches(regex: str | re.Pattern, function: FunctionType) -> list[tuple[str, int]]:
@@ -199,13 +616,17 @@ def get_function_regex_matches(regex: str | re.Pattern, function: FunctionType)
     Returns a tuple (line content, line number) for each match
     of the given regex in the given function's body. The line number
     is the original
-    """
-    if isinstance(regex, re.Pattern):
-        regex = re.compile(regex)
 
+    Raises InconclusiveCheckError if the regular expression ran out of its time budget
+    """
     cleaned_lines = get_clean_function_lines(function)
 
-    return [(line, index + 1) for index, line in enumerate(cleaned_lines) if re.search(regex, line)]
+    try:
+        matching_line_indexes = search_lines_within_budget(regex, cleaned_lines)
+    except RegexTimeoutError as error:
+        raise InconclusiveCheckError(f"Could not check {function.__name__}: {error}")
+
+    return [(cleaned_lines[index], index + 1) for index in matching_line_indexes]
 
 
 def get_imported_modules(py_filename: str) -> set[str]:
@@ -238,3 +659,7 @@ def get_imported_modules(py_filename: str) -> set[str]:
             imported_modules.add(import_name)
 
     return imported_modules
+
+
+# `from shlomobot_pytest.utils import *` keeps importing the fixtures (and pytest and black) into test files
+__all__ = [name for name in list(globals()) if not name.startswith("_")] + list(LAZY_ATTRIBUTES)